@@ -1,6 +1,7 @@
 """
 Extrai arquivos Excel do SharePoint via Microsoft Graph e MSAL.
 Lista os itens da pasta configurada e grava localmente para consumo posterior.
+A configuração vem de variáveis de ambiente SP_*.
 
 Author: Gustavo F. Lima
 License: MIT
@@ -10,10 +11,34 @@ Created: 2025
 # ========================
 # IMPORTS
 # ========================
+import base64
+import json
 import os
+import shutil
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import quote
-from msal import ConfidentialClientApplication
+from msal import ConfidentialClientApplication, SerializableTokenCache
+from requests.adapters import HTTPAdapter
+
+from sharepoint_client import MAX_RETRIES, RETRY_STATUSES, GraphSession, retry_delay
+from sharepoint_manifest import (
+    clear_delta_link,
+    delete_items,
+    get_delta_link,
+    load_folders,
+    load_items,
+    open_manifest,
+    save_delta_link,
+    save_folders,
+    save_items,
+)
+
+try:
+    from sharepoint_parquet import convert_workbooks
+except ImportError:  # openpyxl/pyarrow are only needed with SP_CONVERT_PARQUET=1
+    convert_workbooks = None
 
 # ========================
 # CONFIGURATION (ENV VARS)
@@ -38,6 +63,52 @@ LOCAL_DOWNLOAD_PATH = os.getenv(
 # File extensions to download
 EXCEL_EXTS = (".xlsx", ".xls", ".xlsm")
 
+# Concurrent downloads sharing one keep-alive session (1 = sequential)
+MAX_WORKERS = int(os.getenv("SP_MAX_WORKERS", "8"))
+
+# "full" downloads every Excel file on each run; "delta" downloads only new
+# or modified files and deletes local copies of files removed upstream
+SYNC_MODE = os.getenv("SP_SYNC_MODE", "full")
+MANIFEST_PATH = os.getenv("SP_MANIFEST_PATH", "./data/sharepoint_manifest.db")
+
+# Subfolder levels synced below SP_FOLDER_PATH in both modes (0 = only the
+# folder, -1 = no limit)
+MAX_DEPTH = int(os.getenv("SP_MAX_DEPTH", "-1"))
+
+# Opt-in MSAL token cache persisted between runs (unset = no cache), e.g.
+# ./data/sharepoint_token_cache.json. The file holds access tokens: it is
+# written with owner-only permissions and must stay out of version control.
+TOKEN_CACHE_PATH = os.getenv("SP_TOKEN_CACHE_PATH", "")
+
+# site/drive id cache and how long (seconds) a cached entry is trusted
+ID_CACHE_PATH = os.getenv("SP_ID_CACHE_PATH", "./data/sharepoint_ids.json")
+ID_CACHE_TTL = int(os.getenv("SP_ID_CACHE_TTL", "86400"))
+
+# Resume attempts per download after a dropped or timed-out transfer
+DOWNLOAD_RETRIES = int(os.getenv("SP_DOWNLOAD_RETRIES", "5"))
+
+# Files of at least SP_SEGMENT_MIN_MB are fetched in this many parallel
+# ranged segments (1 = always a single stream)
+DOWNLOAD_SEGMENTS = int(os.getenv("SP_DOWNLOAD_SEGMENTS", "1"))
+SEGMENT_MIN_BYTES = int(os.getenv("SP_SEGMENT_MIN_MB", "256")) * 1024 ** 2
+
+# Check the quickXorHash reported by Graph on every completed download
+VERIFY_HASH = os.getenv("SP_VERIFY_HASH", "1") == "1"
+
+# Convert the synced workbooks to typed Parquet per sheet (sharepoint_parquet.py)
+CONVERT_PARQUET = os.getenv("SP_CONVERT_PARQUET", "0") == "1"
+
+# Graph metadata requests grouped per $batch call (Graph allows up to 20;
+# 1 = no batching, one HTTP call per request)
+BATCH_SIZE = int(os.getenv("SP_BATCH_SIZE", "20"))
+GRAPH_ROOT = "https://graph.microsoft.com/v1.0"
+
+# Fields requested when listing folders
+LIST_SELECT = "id,name,file,folder,size,eTag,cTag,lastModifiedDateTime"
+
+# Fields requested from the delta query
+DELTA_SELECT = "id,name,file,folder,deleted,parentReference,eTag,cTag,size,lastModifiedDateTime"
+
 # ========================
 # VALIDATION
 # ========================
@@ -57,6 +128,39 @@ if not all(required_envs):
         "SP_SITE_HOST, SP_SITE_NAME, SP_FOLDER_PATH."
     )
 
+# ========================
+# LOCAL CACHES
+# ========================
+def write_private_file(path: str, data: bytes):
+    """
+    Atomically replace the file with owner-only (0600) permissions.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+def load_token_cache() -> SerializableTokenCache:
+    cache = SerializableTokenCache()
+    if TOKEN_CACHE_PATH and os.path.exists(TOKEN_CACHE_PATH):
+        with open(TOKEN_CACHE_PATH, encoding="utf-8") as file:
+            cache.deserialize(file.read())
+    return cache
+
+def load_cached_ids() -> dict:
+    if not os.path.exists(ID_CACHE_PATH):
+        return {}
+    try:
+        with open(ID_CACHE_PATH, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_cached_ids(cached_ids: dict):
+    write_private_file(ID_CACHE_PATH, json.dumps(cached_ids, indent=2).encode("utf-8"))
+
 # ========================
 # AUTHENTICATION (MSAL)
 # ========================
@@ -64,14 +168,20 @@ def get_access_token() -> str:
     """
     Authenticate against Azure AD and return an access token
     for Microsoft Graph API.
+
+    With SP_TOKEN_CACHE_PATH the token cache is loaded from and saved to
+    disk: MSAL returns the cached token while it is valid and only asks
+    Azure AD for a new one when it is about to expire.
     """
     authority = f"https://login.microsoftonline.com/{TENANT_ID}"
     scopes = ["https://graph.microsoft.com/.default"]
 
+    token_cache = load_token_cache()
     app = ConfidentialClientApplication(
         CLIENT_ID,
         authority=authority,
-        client_credential=CLIENT_SECRET
+        client_credential=CLIENT_SECRET,
+        token_cache=token_cache
     )
 
     token_result = app.acquire_token_for_client(scopes)
@@ -82,16 +192,99 @@ def get_access_token() -> str:
             f"{token_result.get('error_description')}"
         )
 
+    if TOKEN_CACHE_PATH and token_cache.has_state_changed:
+        write_private_file(TOKEN_CACHE_PATH, token_cache.serialize().encode("utf-8"))
+
+    print(f"[INFO] Token acquired ({token_result.get('token_source', 'identity_provider')})")
     return token_result["access_token"]
 
+# ========================
+# FILE HASHES
+# ========================
+class QuickXorHash:
+    """
+    quickXorHash, the content hash Graph reports for SharePoint and
+    OneDrive for Business files: every byte is XORed into a 160-bit
+    register rotated 11 bits per position, and the length is XORed into
+    the last 8 bytes. Bytes 160 positions apart share a rotation, so each
+    chunk is first folded into 160 bytes with big-integer XORs instead of
+    a per-byte loop.
+    """
+    WIDTH = 160
+    CYCLE = 160  # byte positions until the rotation repeats
+
+    def __init__(self):
+        self.folded = 0
+        self.length = 0
+        self.pending = b""
+
+    @classmethod
+    def fold(cls, block: bytes) -> int:
+        """
+        XOR every CYCLE-byte slice of block (a multiple of CYCLE long).
+        """
+        value = int.from_bytes(block, "little")
+        width = len(block) * 8
+        lane = cls.CYCLE * 8
+        while width > lane:
+            half = (width // lane + 1) // 2 * lane
+            value = (value & ((1 << half) - 1)) ^ (value >> half)
+            width = half
+        return value
+
+    def update(self, data: bytes):
+        self.length += len(data)
+        data = self.pending + bytes(data)
+        aligned = len(data) - len(data) % self.CYCLE
+        if aligned:
+            self.folded ^= self.fold(data[:aligned])
+        self.pending = data[aligned:]
+
+    def digest(self) -> str:
+        """
+        Base64 digest, as in the Graph hashes.quickXorHash field.
+        """
+        folded = self.folded ^ int.from_bytes(self.pending, "little")
+        mask = (1 << self.WIDTH) - 1
+        register = 0
+        for position in range(self.CYCLE):
+            byte = (folded >> (8 * position)) & 0xFF
+            shift = position * 11 % self.WIDTH
+            register ^= ((byte << shift) | (byte >> (self.WIDTH - shift))) & mask
+        register ^= self.length << (self.WIDTH - 64)
+        return base64.b64encode(register.to_bytes(self.WIDTH // 8, "little")).decode("ascii")
+
+    @classmethod
+    def of_file(cls, path: str) -> str:
+        hasher = cls()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(cls.CYCLE * 8192), b""):
+                hasher.update(chunk)
+        return hasher.digest()
+
 # ========================
 # GRAPH API HELPERS
 # ========================
-def graph_get(url: str, headers: dict, params=None) -> dict:
+def create_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """
+    Create an HTTP session whose connection pool holds one keep-alive
+    connection per concurrent request, so TCP/TLS handshakes are paid
+    once per connection instead of once per call. The session retries
+    throttled and failed requests and adapts the number of concurrent
+    requests, up to pool_size, to Graph's throttling (GraphSession).
+    """
+    session = GraphSession(max_concurrency=max(pool_size, 1))
+    adapter = HTTPAdapter(pool_maxsize=max(pool_size, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def graph_get(url: str, headers: dict, params=None, session=None) -> dict:
     """
     Perform a GET request to Microsoft Graph API.
     """
-    response = requests.get(
+    http = session or requests
+    response = http.get(
         url,
         headers=headers,
         params=params,
@@ -100,78 +293,541 @@ def graph_get(url: str, headers: dict, params=None) -> dict:
     response.raise_for_status()
     return response.json()
 
-def graph_download(url: str, headers: dict, destination: str):
+def download_range(url: str, headers: dict, path: str, start: int = 0,
+                   end=None, session=None):
+    """
+    Download bytes start..end (inclusive; end None = to the end of the
+    file) into path, resuming with an HTTP Range request from whatever
+    path already holds. Dropped connections and timeouts are retried up
+    to DOWNLOAD_RETRIES times, each attempt continuing where the last
+    one stopped.
+    """
+    http = session or requests
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        done = os.path.getsize(path) if os.path.exists(path) else 0
+        if end is not None and start + done > end:
+            return
+
+        request_headers = dict(headers)
+        if start + done > 0 or end is not None:
+            request_headers["Range"] = f"bytes={start + done}-{'' if end is None else end}"
+        try:
+            with http.get(url, headers=request_headers, stream=True, timeout=300) as response:
+                if response.status_code == 416 and end is None and done:
+                    return  # Nothing left past what is already on disk
+                response.raise_for_status()
+                if response.status_code != 206 and start + done > 0:
+                    if start > 0:
+                        raise RuntimeError("Server ignored the Range header")
+                    done = 0  # Full body instead of the missing part: start over
+
+                with open(path, "ab" if done else "wb") as file:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        if chunk:
+                            file.write(chunk)
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            print(f"[WARN] Transfer interrupted ({e.__class__.__name__}), resuming.")
+            time.sleep(retry_delay(None, attempt)[0])
+            continue
+
+        if end is None or start + os.path.getsize(path) > end:
+            return
+    raise RuntimeError(f"Incomplete download after {DOWNLOAD_RETRIES} resume(s)")
+
+def graph_download(url: str, headers: dict, destination: str, session=None,
+                   size=None, quick_xor_hash=None, version_tag=None):
     """
     Download a file from Microsoft Graph API using streaming.
+
+    Bytes go to "<destination>.part", which a later call resumes with HTTP
+    Range (version_tag, the item's cTag, discards a partial file of an
+    older version). Files of at least SEGMENT_MIN_BYTES with a known size
+    are fetched in DOWNLOAD_SEGMENTS parallel ranges. The finished file is
+    checked against size and quickXorHash, when given, before the atomic
+    rename to destination, so a failed transfer never leaves a truncated
+    file under the final name.
     """
-    with requests.get(
-        url,
-        headers=headers,
-        stream=True,
-        timeout=300
-    ) as response:
+    part_path = f"{destination}.part"
+    tag_path = f"{part_path}.tag"
+    segments = DOWNLOAD_SEGMENTS if size and size >= SEGMENT_MIN_BYTES else 1
+    segments = max(1, min(segments, size or 1))
+    segment_paths = [f"{part_path}.{n}" for n in range(segments)] if segments > 1 else [part_path]
+
+    previous_tag = None
+    if os.path.exists(tag_path):
+        with open(tag_path, encoding="utf-8") as file:
+            previous_tag = file.read()
+    if previous_tag != (version_tag or ""):
+        for path in [part_path, *segment_paths]:
+            if os.path.exists(path):
+                os.remove(path)
+        with open(tag_path, "w", encoding="utf-8") as file:
+            file.write(version_tag or "")
+
+    if segments == 1:
+        download_range(url, headers, part_path, session=session)
+    else:
+        bounds = [size * n // segments for n in range(segments + 1)]
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            list(executor.map(
+                lambda n: download_range(
+                    url, headers, segment_paths[n], bounds[n], bounds[n + 1] - 1, session
+                ),
+                range(segments),
+            ))
+        with open(part_path, "wb") as target:
+            for path in segment_paths:
+                with open(path, "rb") as source:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+        for path in segment_paths:
+            os.remove(path)
+
+    try:
+        if size is not None and os.path.getsize(part_path) != size:
+            raise RuntimeError(
+                f"Size mismatch: expected {size} bytes, got {os.path.getsize(part_path)}"
+            )
+        if quick_xor_hash and VERIFY_HASH:
+            digest = QuickXorHash.of_file(part_path)
+            if digest != quick_xor_hash:
+                raise RuntimeError(f"quickXorHash mismatch: expected {quick_xor_hash}, got {digest}")
+    except RuntimeError:
+        os.remove(part_path)  # Corrupt: the next attempt starts from zero
+        raise
+
+    os.replace(part_path, destination)
+    os.remove(tag_path)
+
+def graph_batch(urls: list, headers: dict, session=None) -> list:
+    """
+    Send up to 20 GET requests to Graph in a single $batch call and return
+    the response bodies in the order of urls. URLs are absolute, with any
+    query string already applied. Requests throttled inside the batch are
+    sent again after their Retry-After, up to MAX_RETRIES times; a failed
+    request raises HTTPError carrying its own status code, as graph_get
+    would.
+    """
+    http = session or requests
+    bodies = [None] * len(urls)
+    pending = list(range(len(urls)))
+    for attempt in range(MAX_RETRIES + 1):
+        response = http.post(
+            f"{GRAPH_ROOT}/$batch",
+            headers=headers,
+            json={"requests": [
+                {"id": str(index), "method": "GET", "url": urls[index][len(GRAPH_ROOT):]}
+                for index in pending
+            ]},
+            timeout=60
+        )
         response.raise_for_status()
-        with open(destination, "wb") as file:
-            for chunk in response.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    file.write(chunk)
+
+        # Responses may come back in any order; match them by id
+        throttled, delay = [], 0.0
+        for reply in response.json()["responses"]:
+            index = int(reply["id"])
+            if reply["status"] in RETRY_STATUSES and attempt < MAX_RETRIES:
+                throttled.append(index)
+                delay = max(delay, retry_delay(reply.get("headers"), attempt)[0])
+                continue
+            if reply["status"] >= 400:
+                failed = requests.Response()
+                failed.status_code = reply["status"]
+                failed.url = urls[index]
+                failed._content = json.dumps(reply.get("body", {})).encode("utf-8")
+                failed.raise_for_status()
+            bodies[index] = reply.get("body", {})
+
+        if not throttled:
+            return bodies
+        if isinstance(http, GraphSession):
+            http.limiter.record("throttled")
+        time.sleep(delay)
+        pending = sorted(throttled)
+    return bodies
+
+def graph_get_many(urls: list, headers: dict, params=None, session=None,
+                   executor=None) -> list:
+    """
+    GET many Graph URLs and return their bodies in order. With BATCH_SIZE
+    above 1 the requests are grouped into $batch calls, sent concurrently
+    through the executor when one is given.
+    """
+    if params:
+        urls = [requests.Request("GET", url, params=params).prepare().url for url in urls]
+    # A batch of one saves nothing over a plain GET
+    batched = BATCH_SIZE > 1 and len(urls) > 1
+    if batched:
+        chunks = [urls[i:i + BATCH_SIZE] for i in range(0, len(urls), BATCH_SIZE)]
+        send = lambda chunk: graph_batch(chunk, headers, session)
+    else:
+        chunks, send = urls, lambda url: graph_get(url, headers, session=session)
+
+    results = executor.map(send, chunks) if executor is not None else map(send, chunks)
+    if batched:
+        return [body for bodies in results for body in bodies]
+    return list(results)
+
+def list_folder_tree(drive_id: str, folder_path: str, headers: dict, session,
+                     max_depth: int = MAX_DEPTH, max_workers: int = MAX_WORKERS) -> list:
+    """
+    List every file under the folder, walking subfolders level by level
+    with the folders of each level listed concurrently, down to max_depth
+    levels below the folder (0 = the folder only, negative = no limit).
+    Only LIST_SELECT fields are requested. Each file gets a
+    "relative_path" key with its path relative to the folder.
+    """
+    encoded_path = quote(folder_path.strip("/"), safe="/")
+    level = [(
+        f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{encoded_path}:/children",
+        "",
+    )]
+    params = {"$select": LIST_SELECT}
+
+    files = []
+    depth = 0
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        while level:
+            # Every folder of the level in batched requests; next pages are
+            # fetched the same way until no folder has an @odata.nextLink
+            pages = graph_get_many(
+                [url for url, _ in level], headers, params, session, executor
+            )
+            listings = [page.get("value", []) for page in pages]
+            pending = [
+                (index, page["@odata.nextLink"])
+                for index, page in enumerate(pages) if "@odata.nextLink" in page
+            ]
+            while pending:
+                pages = graph_get_many([url for _, url in pending], headers, None, session, executor)
+                for (index, _), page in zip(pending, pages):
+                    listings[index].extend(page.get("value", []))
+                pending = [
+                    (index, page["@odata.nextLink"])
+                    for (index, _), page in zip(pending, pages) if "@odata.nextLink" in page
+                ]
+
+            next_level = []
+            for (_, relative_dir), children in zip(level, listings):
+                for child in children:
+                    relative_path = f"{relative_dir}{child['name']}"
+                    if child.get("folder") is not None:
+                        next_level.append((
+                            f"https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{child['id']}/children",
+                            f"{relative_path}/",
+                        ))
+                    elif child.get("file") is not None:
+                        files.append({**child, "relative_path": relative_path})
+
+            if 0 <= max_depth <= depth:
+                break
+            level = next_level
+            depth += 1
+
+    return files
+
+def local_path(item: dict) -> str:
+    """
+    Local destination of a drive item, mirroring its subfolder when the
+    item came from list_folder_tree.
+    """
+    return os.path.join(LOCAL_DOWNLOAD_PATH, *item.get("relative_path", item["name"]).split("/"))
+
+def download_items(items: list, drive_id: str, headers: dict, session,
+                   max_workers: int = MAX_WORKERS) -> list:
+    """
+    Download drive items concurrently with a bounded thread pool that
+    shares one session. A failed file does not stop the others.
+    Returns a list of (file_name, error) for the failed downloads.
+    """
+    def download(item):
+        download_url = (
+            f"https://graph.microsoft.com/v1.0/drives/"
+            f"{drive_id}/items/{item['id']}/content"
+        )
+        destination = local_path(item)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        graph_download(
+            download_url,
+            headers,
+            destination,
+            session,
+            size=item.get("size"),
+            quick_xor_hash=item.get("file", {}).get("hashes", {}).get("quickXorHash"),
+            version_tag=item.get("cTag") or item.get("eTag"),
+        )
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        futures = {
+            executor.submit(download, item): item.get("relative_path", item["name"])
+            for item in items
+        }
+        for future in as_completed(futures):
+            file_name = futures[future]
+            try:
+                future.result()
+                print(f" - Downloaded {file_name}")
+            except Exception as e:
+                print(f"[ERROR] {file_name}: {e}")
+                failures.append((file_name, str(e)))
+    return failures
 
 # ========================
-# MAIN EXECUTION
+# DELTA SYNC
 # ========================
-def main():
+def graph_delta(url: str, headers: dict, session=None) -> tuple:
     """
-    Main execution flow:
-    1. Authenticate
-    2. Resolve siteId
-    3. Resolve driveId
-    4. List files in target folder
-    5. Download Excel files
+    Follow a Graph delta query through every @odata.nextLink page and
+    return (changed_items, delta_link). When an item shows up more than
+    once, its last state wins.
+    """
+    changes = {}
+    while True:
+        page = graph_get(url, headers, session=session)
+        for item in page.get("value", []):
+            changes[item["id"]] = item
+        if "@odata.nextLink" in page:
+            url = page["@odata.nextLink"]
+            continue
+        return list(changes.values()), page["@odata.deltaLink"]
+
+def is_synced_file(item: dict) -> bool:
     """
+    True for a live (not deleted) Excel file.
+    """
+    return (
+        not item.get("deleted")
+        and bool(item.get("file"))
+        and item.get("name", "").lower().endswith(EXCEL_EXTS)
+    )
 
-    # Ensure local directory exists
-    os.makedirs(LOCAL_DOWNLOAD_PATH, exist_ok=True)
+def subtree_dir(parent_id: str, folder_id: str, folders: dict, max_depth: int = MAX_DEPTH):
+    """
+    Directory, relative to the synced folder, of an item whose parent is
+    parent_id ("" directly inside it, "a/b/" two levels below), or None
+    when the parent is outside the folder or deeper than max_depth.
+    Delta responses from SharePoint omit parentReference.path, so the
+    path is rebuilt by walking folders, {folder_id: (parent_id, name)}.
+    """
+    names = []
+    current = parent_id
+    while current != folder_id:
+        if current not in folders or len(names) > len(folders):
+            return None
+        current, name = folders[current]
+        names.append(name)
+    if 0 <= max_depth < len(names):
+        return None
+    return "".join(f"{name}/" for name in reversed(names))
+
+def apply_folder_changes(changes: list, folders: dict) -> dict:
+    """
+    Return a copy of the folder map updated with the folders added,
+    renamed, moved or deleted in the delta changes.
+    """
+    folders = dict(folders)
+    for item in changes:
+        if item.get("deleted"):
+            folders.pop(item["id"], None)
+        elif item.get("folder") is not None:
+            folders[item["id"]] = (item.get("parentReference", {}).get("id"), item["name"])
+    return folders
+
+def moved_synced_folders(folder_id: str, before: dict, after: dict) -> bool:
+    """
+    True when a folder that was or now is inside the synced folder was
+    renamed, moved or deleted. Its files do not show up in the delta, so
+    their local paths can only be fixed by enumerating the drive again.
+    """
+    for changed_id, entry in before.items():
+        if changed_id == folder_id or after.get(changed_id) == entry:
+            continue
+        if subtree_dir(changed_id, folder_id, before, -1) is not None:
+            return True
+        if changed_id in after and subtree_dir(changed_id, folder_id, after, -1) is not None:
+            return True
+    return False
+
+def sync_delta(drive_id: str, folder_id: str, headers: dict, session) -> list:
+    """
+    Incremental sync of the folder, and of its subfolders down to
+    SP_MAX_DEPTH, through the drive's delta query: the same files as the
+    full mode, saved under the same relative paths. The drive's folders
+    (id, parent, name) are kept in the manifest to place each changed file.
+
+    Downloads only items whose cTag (content tag) or path changed, and
+    removes local files of items deleted, moved out of the folder or no
+    longer Excel. The new delta link is stored only when every download
+    succeeded, so failed files come back in the next run. An expired
+    delta token (410 Gone), a first run or a subfolder renamed, moved or
+    deleted upstream enumerates the whole drive and also drops manifest
+    entries that no longer exist upstream.
+    Returns the failed downloads as (file_name, error).
+    """
+    scope = f"{drive_id}:{folder_id}"
+    start_url = (
+        f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root/delta"
+        f"?$select={DELTA_SELECT}"
+    )
 
-    # Authenticate and prepare headers
-    access_token = get_access_token()
-    headers = {"Authorization": f"Bearer {access_token}"}
+    connection = open_manifest(MANIFEST_PATH)
+    try:
+        known = load_items(connection, scope)
+        known_folders = load_folders(connection, scope)
+        # Without the folder map (first run, older manifest) files in
+        # subfolders cannot be placed: start over from a full enumeration
+        url = (get_delta_link(connection, scope) if known_folders else None) or start_url
+        try:
+            changes, delta_link = graph_delta(url, headers, session)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 410:
+                raise
+            print("[WARN] Delta token expired, resyncing the whole folder.")
+            clear_delta_link(connection, scope)
+            url = start_url
+            changes, delta_link = graph_delta(url, headers, session)
+
+        folders = apply_folder_changes(changes, {} if url == start_url else known_folders)
+        if url != start_url and moved_synced_folders(folder_id, known_folders, folders):
+            print("[INFO] Subfolder renamed, moved or deleted upstream, resyncing the whole folder.")
+            url = start_url
+            changes, delta_link = graph_delta(url, headers, session)
+            folders = apply_folder_changes(changes, {})
+        full_enumeration = url == start_url
+
+        to_download, to_remove, live_ids = [], [], set()
+        for item in changes:
+            previous = known.get(item["id"])
+            relative_dir = None
+            if is_synced_file(item):
+                parent_id = item.get("parentReference", {}).get("id")
+                relative_dir = subtree_dir(parent_id, folder_id, folders)
+            if relative_dir is None:
+                if previous:
+                    to_remove.append(previous)
+                continue
+
+            item = {**item, "relative_path": f"{relative_dir}{item['name']}"}
+            live_ids.add(item["id"])
+            if (
+                previous
+                and previous["ctag"] == item.get("cTag")
+                and previous["local_path"] == local_path(item)
+                and os.path.exists(previous["local_path"])
+            ):
+                continue
+            to_download.append(item)
+
+        if full_enumeration:
+            removed = {row["item_id"] for row in to_remove}
+            to_remove += [
+                row for item_id, row in known.items()
+                if item_id not in live_ids and item_id not in removed
+            ]
+
+        for row in to_remove:
+            if os.path.exists(row["local_path"]):
+                os.remove(row["local_path"])
+            print(f" - Removed {row['name']}")
+        delete_items(connection, [row["item_id"] for row in to_remove])
+
+        print(
+            f"[INFO] Delta: {len(to_download)} new/modified, "
+            f"{len(to_remove)} removed, {len(changes)} change(s) scanned"
+        )
+        failures = download_items(to_download, drive_id, headers, session) if to_download else []
+
+        failed_names = {file_name for file_name, _ in failures}
+        downloaded = [item for item in to_download if item["relative_path"] not in failed_names]
+        for item in downloaded:
+            # Renamed upstream: drop the copy saved under the old name
+            previous = known.get(item["id"])
+            if previous and previous["local_path"] != local_path(item) and os.path.exists(previous["local_path"]):
+                os.remove(previous["local_path"])
+        save_items(connection, scope, downloaded, {item["id"]: local_path(item) for item in downloaded})
+
+        if not failures:
+            save_folders(connection, scope, folders)
+            save_delta_link(connection, scope, delta_link)
+        return failures
+    finally:
+        connection.close()
+
+# ========================
+# MAIN EXECUTION
+# ========================
+def resolve_drive(headers: dict, session, use_cache: bool = True) -> tuple:
+    """
+    Resolve the site and its default drive, returning
+    (site_id, drive_id, from_cache). Ids younger than SP_ID_CACHE_TTL are
+    read from the local cache without calling Graph.
+    """
+    cache_key = f"{SITE_HOST}/sites/{SITE_NAME}"
+    cached_ids = load_cached_ids()
+    cached = cached_ids.get(cache_key)
+    if use_cache and cached and time.time() - cached["cached_at"] < ID_CACHE_TTL:
+        print("[INFO] siteId and driveId read from cache")
+        return cached["site_id"], cached["drive_id"], True
 
     # ------------------------
-    # 1) Get siteId
+    # Get siteId and default driveId (one $batch call when batching);
+    # the drive is addressed by the site path so both go out together
     # ------------------------
     site_url = (
         f"https://graph.microsoft.com/v1.0/sites/"
         f"{SITE_HOST}:/sites/{SITE_NAME}"
     )
-    site = graph_get(site_url, headers)
+    site, drive = graph_get_many(
+        [site_url, f"{site_url}:/drive"], headers, {"$select": "id"}, session
+    )
     site_id = site["id"]
+    drive_id = drive["id"]
 
-    print(f"[INFO] siteId resolved")
+    print(f"[INFO] siteId and driveId resolved")
 
-    # ------------------------
-    # 2) Get default driveId
-    # ------------------------
-    drive_url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drive"
-    drive = graph_get(drive_url, headers)
-    drive_id = drive["id"]
+    cached_ids[cache_key] = {"site_id": site_id, "drive_id": drive_id, "cached_at": time.time()}
+    save_cached_ids(cached_ids)
+    return site_id, drive_id, False
 
-    print(f"[INFO] driveId resolved")
+def sync_folder(drive_id: str, headers: dict, session):
+    """
+    Download the folder's Excel files: everything (full mode) or only
+    what changed since the last run (delta mode).
+    """
+    if SYNC_MODE == "delta":
+        encoded_path = quote(DRIVE_RELATIVE_FOLDER.strip("/"), safe="/")
+        folder_url = (
+            f"https://graph.microsoft.com/v1.0/drives/"
+            f"{drive_id}/root:/{encoded_path}"
+        )
+        folder_id = graph_get(folder_url, headers, {"$select": "id"}, session)["id"]
+
+        failures = sync_delta(drive_id, folder_id, headers, session)
+        if failures:
+            raise RuntimeError(f"{len(failures)} file(s) failed to download.")
+        print("✅ Delta sync completed successfully.")
+
+        if CONVERT_PARQUET:
+            connection = open_manifest(MANIFEST_PATH)
+            try:
+                synced = load_items(connection, f"{drive_id}:{folder_id}").values()
+            finally:
+                connection.close()
+            convert_to_parquet([(row["local_path"], row["etag"]) for row in synced])
+        return
 
     # ------------------------
-    # 3) List folder items
+    # 3) List folder items (all pages, subfolders up to SP_MAX_DEPTH)
     # ------------------------
-    encoded_path = quote(DRIVE_RELATIVE_FOLDER.strip("/"), safe="/")
-    children_url = (
-        f"https://graph.microsoft.com/v1.0/drives/"
-        f"{drive_id}/root:/{encoded_path}:/children"
-    )
-
-    items = graph_get(children_url, headers).get("value", [])
+    items = list_folder_tree(drive_id, DRIVE_RELATIVE_FOLDER, headers, session)
 
     excel_items = [
         item for item in items
-        if item.get("file")
-        and item["name"].lower().endswith(EXCEL_EXTS)
+        if item["name"].lower().endswith(EXCEL_EXTS)
     ]
 
     if not excel_items:
@@ -181,22 +837,63 @@ def main():
     # ------------------------
     # 4) Download files
     # ------------------------
-    print(f"[INFO] Downloading {len(excel_items)} Excel file(s)...")
-
-    for item in excel_items:
-        file_name = item["name"]
-        item_id = item["id"]
-        download_url = (
-            f"https://graph.microsoft.com/v1.0/drives/"
-            f"{drive_id}/items/{item_id}/content"
-        )
-        destination = os.path.join(LOCAL_DOWNLOAD_PATH, file_name)
+    print(
+        f"[INFO] Downloading {len(excel_items)} Excel file(s) "
+        f"with up to {MAX_WORKERS} concurrent request(s)..."
+    )
 
-        print(f" - Downloading {file_name}")
-        graph_download(download_url, headers, destination)
+    failures = download_items(excel_items, drive_id, headers, session)
+    if failures:
+        raise RuntimeError(f"{len(failures)} file(s) failed to download.")
 
     print("✅ Download completed successfully.")
 
+    if CONVERT_PARQUET:
+        convert_to_parquet([(local_path(item), item.get("eTag")) for item in excel_items])
+
+def convert_to_parquet(jobs: list):
+    """
+    Convert the synced workbooks, given as (local path, eTag), to Parquet.
+    Workbooks whose eTag matches the last conversion are not read again.
+    """
+    failures = convert_workbooks(jobs)
+    if failures:
+        raise RuntimeError(f"{len(failures)} workbook(s) failed to convert to Parquet.")
+
+def main():
+    """
+    Main execution flow:
+    1. Authenticate (cached token when still valid)
+    2. Resolve siteId and driveId (cached for SP_ID_CACHE_TTL)
+    3. List files in target folder (or read the delta, with SP_SYNC_MODE=delta)
+    4. Download Excel files
+    """
+    if SYNC_MODE not in ("full", "delta"):
+        raise ValueError(f"Invalid SP_SYNC_MODE: {SYNC_MODE}")
+    if CONVERT_PARQUET and convert_workbooks is None:
+        raise ImportError("SP_CONVERT_PARQUET=1 requires openpyxl and pyarrow.")
+    if not 1 <= BATCH_SIZE <= 20:
+        raise ValueError(f"SP_BATCH_SIZE must be between 1 and 20: {BATCH_SIZE}")
+
+    # Ensure local directory exists
+    os.makedirs(LOCAL_DOWNLOAD_PATH, exist_ok=True)
+
+    # Authenticate and prepare headers
+    access_token = get_access_token()
+    headers = {"Authorization": f"Bearer {access_token}"}
+    session = create_session()
+
+    _, drive_id, from_cache = resolve_drive(headers, session)
+    try:
+        sync_folder(drive_id, headers, session)
+    except requests.HTTPError as e:
+        # A cached drive id that no longer exists: resolve again once
+        if not from_cache or e.response is None or e.response.status_code != 404:
+            raise
+        print("[WARN] Cached driveId not found, resolving again.")
+        _, drive_id, _ = resolve_drive(headers, session, use_cache=False)
+        sync_folder(drive_id, headers, session)
+
 # ========================
 # ENTRY POINT
 # ========================
@@ -0,0 +1,179 @@
+"""
+Cliente HTTP compartilhado do Microsoft Graph usado por sharepoint.py.
+Repete as requisições recusadas por throttling (429/503) ou falhas
+transitórias respeitando o Retry-After do Graph, com backoff exponencial
+com jitter, e limita as requisições simultâneas com um controle adaptativo
+(AIMD): corta a concorrência pela metade quando o Graph pede calma e volta
+a subir aos poucos enquanto as respostas chegam bem, para que os downloads
+paralelos não levem o app registration a ser estrangulado.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# ========================
+# CONFIGURATION (ENV VARS)
+# ========================
+# Retries per request after throttling or transient failures
+MAX_RETRIES = int(os.getenv("SP_MAX_RETRIES", "6"))
+
+# Exponential backoff (seconds) when Graph sends no Retry-After
+BACKOFF_BASE = float(os.getenv("SP_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.getenv("SP_BACKOFF_MAX", "60"))
+
+# Floor of the adaptive concurrency limit
+MIN_CONCURRENCY = int(os.getenv("SP_MIN_CONCURRENCY", "1"))
+
+# 429 and 503 mean throttling; 500/502/504 are retried without cutting concurrency
+THROTTLE_STATUSES = (429, 503)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def retry_delay(headers, attempt: int) -> tuple:
+    """
+    Seconds to wait before retrying, and whether Graph asked for it: the
+    Retry-After header (seconds or HTTP date) when present, otherwise
+    exponential backoff with full jitter.
+    """
+    retry_after = (headers or {}).get("Retry-After")
+    if retry_after:
+        try:
+            seconds = float(retry_after)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                seconds = None
+        if seconds is not None:
+            # A little jitter so the waiting threads do not return together
+            return max(seconds, 0) + random.uniform(0, BACKOFF_BASE), True
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)), False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on in-flight requests: each success raises the limit by
+    1/limit (about +1 per round of requests) up to max_limit, and a
+    throttled response halves it, at most once per second so a burst of
+    429s from the same round counts as a single signal.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = MIN_CONCURRENCY):
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = max(min(min_limit, self.max_limit), 1)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, outcome=None):
+        """
+        Free a slot; outcome is "ok", "throttled" or None (no signal).
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self.record(outcome)
+            self._condition.notify_all()
+
+    def record(self, outcome):
+        with self._condition:
+            if outcome == "ok":
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif outcome == "throttled":
+                now = time.monotonic()
+                if now - self._last_decrease >= 1:
+                    self._last_decrease = now
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    print(f"[WARN] Graph throttling: concurrency limited to {int(self.limit)}")
+            self._condition.notify_all()
+
+
+class GraphSession(requests.Session):
+    """
+    requests.Session for Graph calls. Every request waits for a slot in
+    the adaptive limiter and for any pause Graph imposed through
+    Retry-After, and is retried on RETRY_STATUSES and connection errors.
+    Streamed responses keep their slot until closed, so a download counts
+    against the limit for as long as it transfers.
+    """
+
+    def __init__(self, max_concurrency: int, max_retries: int = MAX_RETRIES):
+        super().__init__()
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.max_retries = max_retries
+        self._paused_until = 0.0
+        self._pause_lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        """
+        Hold every new request for the given time (Retry-After applies to
+        the whole app, not only to the request that got it).
+        """
+        with self._pause_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_for_pause(self):
+        while True:
+            with self._pause_lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def request(self, method, url, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_pause()
+            self.limiter.acquire()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.limiter.release()
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(retry_delay(None, attempt)[0])
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay, from_graph = retry_delay(response.headers, attempt)
+                response.close()
+                throttled = response.status_code in THROTTLE_STATUSES
+                self.limiter.release("throttled" if throttled else None)
+                if from_graph:
+                    self.pause(delay)
+                else:
+                    time.sleep(delay)
+                continue
+
+            outcome = "ok" if response.status_code < 400 else None
+            if kwargs.get("stream"):
+                self._release_on_close(response, outcome)
+            else:
+                self.limiter.release(outcome)
+            return response
+
+    def _release_on_close(self, response, outcome):
+        close = response.close
+        released = threading.Event()
+
+        def close_and_release():
+            close()
+            if not released.is_set():
+                released.set()
+                self.limiter.release(outcome)
+
+        response.close = close_and_release
@@ -0,0 +1,183 @@
+"""
+Manifesto SQLite do sync incremental do SharePoint (sharepoint.py).
+Guarda id, eTag, cTag, tamanho, lastModified e caminho local de cada item
+baixado, além do delta link do Graph e do mapa de pastas do drive (id,
+pasta pai e nome) de cada pasta sincronizada, para que a próxima execução
+baixe só o que mudou. Também registra as conversões
+para Parquet (sharepoint_parquet.py) com a chave de cache de cada pasta de
+trabalho.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+
+def open_manifest(db_path: str) -> sqlite3.Connection:
+    """
+    Open (or create) the manifest database.
+    """
+    folder = os.path.dirname(os.path.abspath(db_path))
+    os.makedirs(folder, exist_ok=True)
+
+    connection = sqlite3.connect(db_path)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS items (
+            item_id       TEXT PRIMARY KEY,
+            scope         TEXT NOT NULL,
+            name          TEXT NOT NULL,
+            local_path    TEXT NOT NULL,
+            etag          TEXT,
+            ctag          TEXT,
+            size          INTEGER,
+            last_modified TEXT,
+            synced_at     TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_items_scope ON items (scope);
+
+        CREATE TABLE IF NOT EXISTS delta_links (
+            scope      TEXT PRIMARY KEY,
+            delta_link TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS folders (
+            folder_id  TEXT NOT NULL,
+            scope      TEXT NOT NULL,
+            parent_id  TEXT,
+            name       TEXT NOT NULL,
+            PRIMARY KEY (scope, folder_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS conversions (
+            source_path  TEXT PRIMARY KEY,
+            cache_key    TEXT NOT NULL,
+            outputs      TEXT NOT NULL,
+            converted_at TEXT NOT NULL
+        );
+    """)
+    return connection
+
+
+def get_delta_link(connection: sqlite3.Connection, scope: str):
+    """
+    Return the stored delta link for the scope (drive + folder), or None.
+    """
+    row = connection.execute(
+        "SELECT delta_link FROM delta_links WHERE scope = ?", (scope,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def save_delta_link(connection: sqlite3.Connection, scope: str, delta_link: str):
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO delta_links (scope, delta_link, updated_at) VALUES (?, ?, ?)",
+            (scope, delta_link, datetime.now().isoformat(timespec="seconds")),
+        )
+
+
+def clear_delta_link(connection: sqlite3.Connection, scope: str):
+    with connection:
+        connection.execute("DELETE FROM delta_links WHERE scope = ?", (scope,))
+
+
+def load_folders(connection: sqlite3.Connection, scope: str) -> dict:
+    """
+    Return {folder_id: (parent_id, name)} for every drive folder seen by
+    the scope's delta query.
+    """
+    return {
+        folder_id: (parent_id, name)
+        for folder_id, parent_id, name in connection.execute(
+            "SELECT folder_id, parent_id, name FROM folders WHERE scope = ?", (scope,)
+        )
+    }
+
+
+def save_folders(connection: sqlite3.Connection, scope: str, folders: dict):
+    """
+    Replace the scope's folder map with folders, {folder_id: (parent_id, name)}.
+    """
+    with connection:
+        connection.execute("DELETE FROM folders WHERE scope = ?", (scope,))
+        connection.executemany(
+            "INSERT INTO folders (folder_id, scope, parent_id, name) VALUES (?, ?, ?, ?)",
+            [(folder_id, scope, parent_id, name) for folder_id, (parent_id, name) in folders.items()],
+        )
+
+
+def load_items(connection: sqlite3.Connection, scope: str) -> dict:
+    """
+    Return {item_id: row dict} for every item of the scope.
+    """
+    connection.row_factory = sqlite3.Row
+    try:
+        return {
+            row["item_id"]: dict(row)
+            for row in connection.execute("SELECT * FROM items WHERE scope = ?", (scope,))
+        }
+    finally:
+        connection.row_factory = None
+
+
+def save_items(connection: sqlite3.Connection, scope: str, items: list, local_paths: dict):
+    """
+    Upsert downloaded Graph driveItems; local_paths maps item id to the
+    local file written for it.
+    """
+    now = datetime.now().isoformat(timespec="seconds")
+    with connection:
+        connection.executemany(
+            """
+            INSERT OR REPLACE INTO items
+                (item_id, scope, name, local_path, etag, ctag, size, last_modified, synced_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    item["id"],
+                    scope,
+                    item["name"],
+                    local_paths[item["id"]],
+                    item.get("eTag"),
+                    item.get("cTag"),
+                    item.get("size"),
+                    item.get("lastModifiedDateTime"),
+                    now,
+                )
+                for item in items
+            ],
+        )
+
+
+def delete_items(connection: sqlite3.Connection, item_ids):
+    with connection:
+        connection.executemany(
+            "DELETE FROM items WHERE item_id = ?", [(item_id,) for item_id in item_ids]
+        )
+
+
+def get_conversion(connection: sqlite3.Connection, source_path: str):
+    """
+    Return (cache_key, output paths) of the last conversion of the
+    workbook, or None.
+    """
+    row = connection.execute(
+        "SELECT cache_key, outputs FROM conversions WHERE source_path = ?", (source_path,)
+    ).fetchone()
+    return (row[0], json.loads(row[1])) if row else None
+
+
+def save_conversion(connection: sqlite3.Connection, source_path: str, cache_key: str, outputs: list):
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO conversions (source_path, cache_key, outputs, converted_at) "
+            "VALUES (?, ?, ?, ?)",
+            (source_path, cache_key, json.dumps(outputs), datetime.now().isoformat(timespec="seconds")),
+        )
@@ -0,0 +1,322 @@
+"""
+Converte as planilhas Excel baixadas por sharepoint.py em Parquet tipado,
+um arquivo por aba, para que os consumidores não precisem reabrir cada
+.xlsx com o openpyxl. Cada pasta de trabalho é lida uma única vez em modo
+read-only (streaming), opcionalmente em um pool de processos, e a conversão
+fica em cache no manifesto SQLite pela eTag do item (ou pelo hash do
+conteúdo, quando convertida fora do sync): pastas de trabalho que não
+mudaram não são lidas de novo.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+# Para instalar as dependências necessárias, use o seguinte comando:
+# pip install openpyxl pyarrow
+
+import datetime
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+
+from sharepoint_manifest import get_conversion, open_manifest, save_conversion
+
+# ========================
+# CONFIGURATION (ENV VARS)
+# ========================
+# Folder with the downloaded workbooks (same as sharepoint.py)
+LOCAL_DOWNLOAD_PATH = os.getenv("SP_LOCAL_PATH", "./data/sharepoint")
+
+# Parquet output root: <root>/<workbook path without extension>/<sheet>.parquet
+PARQUET_PATH = os.getenv("SP_PARQUET_PATH", "./data/sharepoint_parquet")
+PARQUET_COMPRESSION = os.getenv("SP_PARQUET_COMPRESSION", "zstd")
+
+# Rows per Parquet row group; column types are inferred from the first one
+BATCH_ROWS = int(os.getenv("SP_PARQUET_BATCH_ROWS", "50000"))
+
+# Workbooks converted in parallel processes (1 = in this process)
+PARQUET_WORKERS = int(os.getenv("SP_PARQUET_WORKERS", "1"))
+
+# Conversion cache, kept in the sync manifest database
+MANIFEST_PATH = os.getenv("SP_MANIFEST_PATH", "./data/sharepoint_manifest.db")
+
+# openpyxl reads only the Office Open XML formats
+CONVERTIBLE_EXTS = (".xlsx", ".xlsm")
+
+
+class SchemaConflict(Exception):
+    """
+    A batch holds values that do not fit the column type inferred so far.
+    """
+
+    def __init__(self, column: int, promoted: pa.DataType):
+        super().__init__(column, promoted)
+        self.column = column
+        self.promoted = promoted
+
+
+# ========================
+# TYPE INFERENCE
+# ========================
+def infer_type(values: list):
+    """
+    Arrow type of a column batch from the Python values openpyxl returns,
+    or None when the batch has no values. Integers and floats together
+    become float64; any other mix falls back to string.
+    """
+    kinds = {type(value) for value in values if value is not None}
+    if not kinds:
+        return None
+    if kinds == {bool}:
+        return pa.bool_()
+    if kinds == {int}:
+        return pa.int64()
+    if kinds <= {int, float}:
+        return pa.float64()
+    if kinds == {datetime.datetime}:
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def promote(current: pa.DataType, incoming: pa.DataType) -> pa.DataType:
+    if {current, incoming} <= {pa.int64(), pa.float64()}:
+        return pa.float64()
+    return pa.string()
+
+
+def fits(current: pa.DataType, incoming) -> bool:
+    return incoming is None or incoming == current or (
+        current == pa.float64() and incoming == pa.int64()
+    ) or current == pa.string()
+
+
+def to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def column_names(header: tuple, width: int) -> list:
+    """
+    Column names from the header row: blanks become column_<n> and
+    repeated names get a _<n> suffix.
+    """
+    names, seen = [], {}
+    for position in range(width):
+        value = header[position] if position < len(header) else None
+        name = str(value).strip() if value is not None and str(value).strip() else f"column_{position + 1}"
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    return names
+
+
+def safe_name(name: str) -> str:
+    return re.sub(r'[\\/:*?"<>|]', "_", name).strip() or "sheet"
+
+
+# ========================
+# CONVERSION
+# ========================
+def iter_batches(sheet, width: int, batch_rows: int):
+    """
+    Yield the data rows of the sheet (after the header) as lists of
+    columns with up to batch_rows rows, skipping fully empty rows.
+    """
+    columns = [[] for _ in range(width)]
+    count = 0
+    for row in sheet.iter_rows(min_row=2, values_only=True):
+        if not any(value is not None for value in row):
+            continue
+        for position in range(width):
+            columns[position].append(row[position] if position < len(row) else None)
+        count += 1
+        if count == batch_rows:
+            yield columns
+            columns = [[] for _ in range(width)]
+            count = 0
+    if count:
+        yield columns
+
+
+def write_sheet(sheet, destination: str, overrides: dict, batch_rows: int = BATCH_ROWS) -> int:
+    """
+    Stream one sheet into a Parquet file, one row group per batch. The
+    schema comes from the first batch plus the overrides; a later batch
+    that does not fit raises SchemaConflict. Returns the rows written.
+    """
+    header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+    width = max(len(header), sheet.max_column or 0)
+    names = column_names(header, width)
+
+    schema = None
+    writer = None
+    rows = 0
+    try:
+        for columns in iter_batches(sheet, width, batch_rows):
+            inferred = [infer_type(values) for values in columns]
+            if schema is None:
+                types = [
+                    overrides.get(position) or inferred[position] or pa.string()
+                    for position in range(width)
+                ]
+                schema = pa.schema([pa.field(name, kind) for name, kind in zip(names, types)])
+                writer = pq.ParquetWriter(destination, schema, compression=PARQUET_COMPRESSION)
+
+            arrays = []
+            for position, (field, values) in enumerate(zip(schema, columns)):
+                if not fits(field.type, inferred[position]):
+                    raise SchemaConflict(position, promote(field.type, inferred[position]))
+                if field.type == pa.string():
+                    values = [to_text(value) for value in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(columns[0]) if columns else 0
+
+        if writer is None:
+            # Header only (or empty sheet): keep the columns, as strings
+            schema = pa.schema([pa.field(name, overrides.get(i) or pa.string()) for i, name in enumerate(names)])
+            writer = pq.ParquetWriter(destination, schema, compression=PARQUET_COMPRESSION)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def convert_workbook(source_path: str, output_dir: str, batch_rows: int = BATCH_ROWS) -> list:
+    """
+    Convert every sheet of the workbook into <output_dir>/<sheet>.parquet,
+    reading it in openpyxl read-only mode. Files are written under a
+    temporary name and renamed when complete. When a column turns out to
+    need a wider type than the first batch suggested (e.g. text after
+    50,000 numbers), the sheet is read again with that column promoted.
+    Returns a list of (sheet name, output path, rows).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workbook = load_workbook(source_path, read_only=True, data_only=True)
+    outputs = []
+    try:
+        for sheet in workbook.worksheets:
+            destination = os.path.join(output_dir, f"{safe_name(sheet.title)}.parquet")
+            temp_path = f"{destination}.tmp"
+            overrides = {}
+            while True:
+                try:
+                    rows = write_sheet(sheet, temp_path, overrides, batch_rows)
+                    break
+                except SchemaConflict as conflict:
+                    overrides[conflict.column] = conflict.promoted
+            os.replace(temp_path, destination)
+            outputs.append((sheet.title, destination, rows))
+    finally:
+        workbook.close()
+    return outputs
+
+
+def output_dir_for(source_path: str, source_root: str = LOCAL_DOWNLOAD_PATH,
+                   parquet_root: str = PARQUET_PATH) -> str:
+    relative = os.path.relpath(os.path.abspath(source_path), os.path.abspath(source_root))
+    if relative.startswith(".."):
+        relative = os.path.basename(source_path)
+    return os.path.join(parquet_root, os.path.splitext(relative)[0])
+
+
+def content_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f"sha256:{digest.hexdigest()}"
+
+
+def convert_workbooks(jobs: list, workers: int = PARQUET_WORKERS,
+                      manifest_path: str = MANIFEST_PATH) -> list:
+    """
+    Convert the workbooks in jobs, a list of (source_path, cache_key);
+    a cache_key of None uses the SHA-256 of the file content. Workbooks
+    whose key matches the last conversion, with every output still on
+    disk, are skipped. Returns a list of (source_path, error) failures.
+    """
+    connection = open_manifest(manifest_path)
+    try:
+        pending = []
+        for source_path, cache_key in jobs:
+            if not source_path.lower().endswith(CONVERTIBLE_EXTS):
+                print(f"[WARN] Skipping {source_path}: only .xlsx/.xlsm are converted")
+                continue
+            cache_key = cache_key or content_hash(source_path)
+            cached = get_conversion(connection, source_path)
+            if cached and cached[0] == cache_key and all(os.path.exists(path) for path in cached[1]):
+                continue
+            pending.append((source_path, cache_key))
+
+        print(f"[INFO] Parquet: {len(pending)} workbook(s) to convert, {len(jobs) - len(pending)} cached or skipped")
+        if not pending:
+            return []
+
+        failures = []
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            futures = [
+                (source_path, cache_key,
+                 executor.submit(convert_workbook, source_path, output_dir_for(source_path))
+                 if executor else None)
+                for source_path, cache_key in pending
+            ]
+            for source_path, cache_key, future in futures:
+                try:
+                    outputs = (
+                        future.result() if future
+                        else convert_workbook(source_path, output_dir_for(source_path))
+                    )
+                except Exception as e:
+                    print(f"[ERROR] {source_path}: {e}")
+                    failures.append((source_path, str(e)))
+                    continue
+                save_conversion(connection, source_path, cache_key, [path for _, path, _ in outputs])
+                for sheet_name, _, rows in outputs:
+                    print(f" - {os.path.basename(source_path)} [{sheet_name}]: {rows} row(s)")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return failures
+    finally:
+        connection.close()
+
+
+def list_workbooks(folder: str = LOCAL_DOWNLOAD_PATH) -> list:
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(folder)
+        for name in names
+        if name.lower().endswith(CONVERTIBLE_EXTS)
+    )
+
+
+# ========================
+# MAIN EXECUTION
+# ========================
+def main():
+    """
+    Convert every workbook under SP_LOCAL_PATH, cached by content hash.
+    sharepoint.py converts right after the download, keyed by eTag, when
+    SP_CONVERT_PARQUET=1.
+    """
+    failures = convert_workbooks([(path, None) for path in list_workbooks()])
+    if failures:
+        raise RuntimeError(f"{len(failures)} workbook(s) failed to convert.")
+    print("✅ Parquet conversion completed successfully.")
+
+
+# ========================
+# ENTRY POINT
+# ========================
+if __name__ == "__main__":
+    main()
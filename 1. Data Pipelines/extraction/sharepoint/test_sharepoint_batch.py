@@ -0,0 +1,192 @@
+"""
+Testes do agrupamento de requisições em $batch do sharepoint.py contra um
+servidor Graph falso local: quantas chamadas saem para N URLs, a nova
+tentativa dos itens recusados com 429 dentro do lote e o erro de um item
+que falhou.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+# pip install pytest requests msal
+
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+# sharepoint.py validates its settings on import; Retry-After is honoured
+# without the extra jitter so the retries do not slow the tests down
+for name in ("SP_CLIENT_ID", "SP_CLIENT_SECRET", "SP_TENANT_ID",
+             "SP_SITE_HOST", "SP_SITE_NAME", "SP_FOLDER_PATH"):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("SP_BACKOFF_BASE", "0")
+
+import sharepoint  # noqa: E402
+from sharepoint import GRAPH_ROOT, create_session, graph_get_many  # noqa: E402
+
+
+class FakeGraph(ThreadingHTTPServer):
+    """
+    Minimal Graph: GET /v1.0/items/<id> answers {"id": <id>}, anything else
+    is 404. POST /v1.0/$batch answers each sub-request in reverse order.
+    throttle maps a path to how many 429s it gets before succeeding.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeGraphHandler)
+        self.lock = threading.Lock()
+        self.batches = []
+        self.gets = []
+        self.throttle = {}
+
+    def reply(self, path):
+        with self.lock:
+            if self.throttle.get(path, 0) > 0:
+                self.throttle[path] -= 1
+                return 429, {"Retry-After": "0"}, {"error": {"code": "TooManyRequests"}}
+        match = re.fullmatch(r"/items/([^/?]+)(\?.*)?", path)
+        if match is None:
+            return 404, {}, {"error": {"code": "itemNotFound"}}
+        return 200, {}, {"id": match.group(1)}
+
+
+class FakeGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, headers, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path[len("/v1.0"):]
+        with self.server.lock:
+            self.server.gets.append(path)
+        self.send_json(*self.server.reply(path))
+
+    def do_POST(self):
+        assert self.path == "/v1.0/$batch"
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        requests_ = body["requests"]
+        assert len(requests_) <= 20
+        with self.server.lock:
+            self.server.batches.append(len(requests_))
+
+        responses = []
+        for request in reversed(requests_):
+            status, headers, reply = self.server.reply(request["url"])
+            responses.append({"id": request["id"], "status": status, "headers": headers, "body": reply})
+        self.send_json(200, {}, {"responses": responses})
+
+
+class LocalGraphAdapter(HTTPAdapter):
+    """
+    Sends the https://graph.microsoft.com requests to the fake server.
+    """
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace("https://graph.microsoft.com", self.base_url)
+        return super().send(request, **kwargs)
+
+
+@pytest.fixture
+def graph():
+    server = FakeGraph()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def session(graph):
+    session = create_session(4)
+    session.mount("https://graph.microsoft.com", LocalGraphAdapter(f"http://127.0.0.1:{graph.server_port}"))
+    yield session
+    session.close()
+
+
+def item_urls(count):
+    return [f"{GRAPH_ROOT}/items/{index}" for index in range(count)]
+
+
+def test_urls_are_grouped_in_batches_of_batch_size(graph, session):
+    bodies = graph_get_many(item_urls(45), {}, None, session)
+
+    assert bodies == [{"id": str(index)} for index in range(45)]
+    assert graph.batches == [20, 20, 5]
+    assert graph.gets == []
+
+
+def test_batches_sent_through_an_executor_keep_the_order(graph, session):
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        bodies = graph_get_many(item_urls(60), {}, {"$select": "id"}, session, executor)
+
+    assert bodies == [{"id": str(index)} for index in range(60)]
+    assert sorted(graph.batches) == [20, 20, 20]
+
+
+def test_single_url_is_a_plain_get(graph, session):
+    assert graph_get_many(item_urls(1), {}, None, session) == [{"id": "0"}]
+    assert graph.batches == []
+    assert graph.gets == ["/items/0"]
+
+
+def test_no_batching_when_batch_size_is_one(monkeypatch, graph, session):
+    monkeypatch.setattr(sharepoint, "BATCH_SIZE", 1)
+
+    assert graph_get_many(item_urls(3), {}, None, session) == [{"id": str(i)} for i in range(3)]
+    assert graph.batches == []
+    assert len(graph.gets) == 3
+
+
+def test_throttled_items_are_sent_again_alone(graph, session):
+    graph.throttle = {"/items/1": 1, "/items/3": 2}
+
+    bodies = graph_get_many(item_urls(5), {}, None, session)
+
+    assert bodies == [{"id": str(index)} for index in range(5)]
+    assert graph.batches == [5, 2, 1]
+
+
+def test_item_still_throttled_after_max_retries_raises(monkeypatch, graph, session):
+    monkeypatch.setattr(sharepoint, "MAX_RETRIES", 2)
+    graph.throttle = {"/items/2": 10}
+
+    with pytest.raises(requests.HTTPError) as error:
+        graph_get_many(item_urls(4), {}, None, session)
+
+    assert error.value.response.status_code == 429
+    assert graph.batches == [4, 1, 1]
+
+
+def test_failed_item_inside_a_batch_raises_its_status(graph, session):
+    urls = item_urls(3) + [f"{GRAPH_ROOT}/missing"]
+
+    with pytest.raises(requests.HTTPError) as error:
+        graph_get_many(urls, {}, None, session)
+
+    assert error.value.response.status_code == 404
+    assert error.value.response.url == f"{GRAPH_ROOT}/missing"
+    assert graph.batches == [4]
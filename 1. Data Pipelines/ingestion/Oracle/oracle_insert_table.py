@@ -6,53 +6,17 @@ License: MIT
 Created: 2025
 """
 
-import os
 import oracledb
-from dotenv import load_dotenv
 
-
-def init_oracle():
-    """
-    Inicializa o Oracle Client (Thick Mode)
-    """
-    # Instalar o oracle cliente e incluir na path: C:\oracle\instantclient_23_9
-
-    if os.name == "nt":  # Windows
-        lib_dir = r"C:\oracle\instantclient_23_9"
-    else:  # Linux / Docker
-        lib_dir = "/opt/oracle/instantclient_23_26"
-
-    oracledb.init_oracle_client(lib_dir=lib_dir)
-
-
-def get_connection():
-    load_dotenv()
-
-    user = os.getenv("DW_C5DBSTDY_CONSINCO_HML_USER")
-    pwd = os.getenv("DW_C5DBSTDY_CONSINCO_HML_PWD")
-    host = os.getenv("DW_C5DBSTDY_CONSINCO_HML_HOST")
-    port = os.getenv("DW_C5DBSTDY_CONSINCO_HML_PORT")
-    service = os.getenv("DW_C5DBSTDY_CONSINCO_HML_SERVICE")
-
-    dsn = f"{host}:{port}/{service}"
-
-    return oracledb.connect(
-        user=user,
-        password=pwd,
-        dsn=dsn
-    )
+from oracle_pool import get_connection
 
 
 def insert_example_rows():
-    # Inicializa Oracle Client (UMA vez por processo)
-    init_oracle()
-
+    # Conexão emprestada do pool, já com CURRENT_SCHEMA ajustado
     connection = get_connection()
 
     try:
         with connection.cursor() as cursor:
-            cursor.execute("ALTER SESSION SET CURRENT_SCHEMA = DW")
-
             sql = """
                 INSERT INTO DW.EXEMPLO_TABELA (NOME, DESCRICAO)
                 VALUES (:nome, :descricao)
@@ -75,7 +39,7 @@ def insert_example_rows():
         print("❌ Erro Oracle:", error.message)
 
     finally:
-        connection.close()
+        connection.close()  # Devolve a sessão ao pool
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+"""
+Acesso compartilhado ao banco Oracle de HML para os scripts desta pasta.
+Mantém um único pool de conexões (oracledb.create_pool) por processo, com
+tamanho mínimo e máximo configuráveis e cache de statements, e ajusta o
+CURRENT_SCHEMA uma única vez por sessão criada no pool, para que os jobs
+pequenos não paguem a abertura de uma conexão nova a cada chamada.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+# pip install oracledb python-dotenv
+
+import atexit
+import os
+import re
+import threading
+
+import oracledb
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Tamanho do pool: sessões abertas na criação, teto e quantas abrir por vez
+POOL_MIN = int(os.getenv("ORACLE_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("ORACLE_POOL_MAX", "4"))
+POOL_INCREMENT = int(os.getenv("ORACLE_POOL_INCREMENT", "1"))
+
+# Statements mantidos em cache por sessão (0 desliga)
+STMT_CACHE_SIZE = int(os.getenv("ORACLE_STMT_CACHE", "50"))
+
+# Schema padrão das sessões (ALTER SESSION SET CURRENT_SCHEMA)
+CURRENT_SCHEMA = os.getenv("DW_C5DBSTDY_CONSINCO_HML_SCHEMA", "DW")
+
+_pool = None
+_pool_lock = threading.Lock()
+_client_initialized = False
+
+
+def init_oracle():
+    """
+    Inicializa o Oracle Client (Thick Mode) apenas uma vez por processo
+    """
+    global _client_initialized
+    if _client_initialized:
+        return
+
+    # Instalar o oracle cliente e incluir na path: C:\oracle\instantclient_23_9
+    if os.name == "nt":  # Windows
+        lib_dir = r"C:\oracle\instantclient_23_9"
+    else:  # Linux / Docker
+        lib_dir = "/opt/oracle/instantclient_23_26"
+
+    oracledb.init_oracle_client(lib_dir=lib_dir)
+    _client_initialized = True
+
+
+def _init_session(connection, requested_tag):
+    """
+    Chamado pelo pool só quando uma sessão nova é criada; as conexões
+    reaproveitadas já chegam com o schema ajustado.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER SESSION SET CURRENT_SCHEMA = {CURRENT_SCHEMA}")
+
+
+def get_pool():
+    """
+    Retorna o pool do processo, criando-o na primeira chamada
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+
+        if not re.fullmatch(r"[A-Za-z][A-Za-z0-9_$#]*", CURRENT_SCHEMA):
+            raise ValueError(f"Schema inválido: {CURRENT_SCHEMA}")
+
+        init_oracle()
+
+        user = os.getenv("DW_C5DBSTDY_CONSINCO_HML_USER")
+        pwd = os.getenv("DW_C5DBSTDY_CONSINCO_HML_PWD")
+        host = os.getenv("DW_C5DBSTDY_CONSINCO_HML_HOST")
+        port = os.getenv("DW_C5DBSTDY_CONSINCO_HML_PORT")
+        service = os.getenv("DW_C5DBSTDY_CONSINCO_HML_SERVICE")
+
+        dsn = f"{host}:{port}/{service}"
+
+        _pool = oracledb.create_pool(
+            user=user,
+            password=pwd,
+            dsn=dsn,
+            min=POOL_MIN,
+            max=POOL_MAX,
+            increment=POOL_INCREMENT,
+            getmode=oracledb.POOL_GETMODE_WAIT,
+            session_callback=_init_session,
+            stmtcachesize=STMT_CACHE_SIZE,
+        )
+        atexit.register(close_pool)
+        return _pool
+
+
+def get_connection():
+    """
+    Empresta uma conexão do pool. connection.close() (ou o fim de um
+    bloco with) devolve a sessão ao pool em vez de encerrá-la.
+    """
+    return get_pool().acquire()
+
+
+def close_pool():
+    """
+    Fecha o pool e as sessões abertas (chamado também na saída do processo)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close(force=True)
+            _pool = None
+
+
+# Na .env que fica na raiz do repo, incluir as credenciais:
+
+# DW_C5DBSTDY_CONSINCO_HML_USER=OWNER
+# DW_C5DBSTDY_CONSINCO_HML_PWD="SENHA"
+# DW_C5DBSTDY_CONSINCO_HML_HOST=HOST
+# DW_C5DBSTDY_CONSINCO_HML_PORT=PORT
+# DW_C5DBSTDY_CONSINCO_HML_SERVICE=BANCO
+# DW_C5DBSTDY_CONSINCO_HML_SCHEMA=DW     (opcional)
+# ORACLE_POOL_MIN=1 / ORACLE_POOL_MAX=4 / ORACLE_STMT_CACHE=50   (opcionais)
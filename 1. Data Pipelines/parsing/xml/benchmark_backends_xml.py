@@ -0,0 +1,74 @@
+"""
+Compara os backends XML de processar_xml_nfe.py (stdlib x lxml).
+Primeiro confere que os dois geram exatamente as mesmas linhas, nos modos
+dom e streaming; depois mede a vazão de cada um em notas/s e itens/s.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+import io
+import time
+
+import processar_xml_nfe
+from gerar_nfe_sintetica import gerar_nota_xml
+from processar_xml_nfe import EXTRATORES, lxml_etree
+
+# Quantidade de notas, itens por nota e repetições do benchmark
+TOTAL_NOTAS = 200
+ITENS_POR_NOTA = 40
+REPETICOES = 3
+
+
+def extrair(notas, backend, modo):
+    """
+    Extrai todas as notas com o backend e o modo indicados.
+    """
+    processar_xml_nfe.BACKEND = processar_xml_nfe.BACKEND_STREAMING = backend
+    extrator = EXTRATORES[modo]
+    return [extrator(io.BytesIO(nota)) for nota in notas]
+
+
+def medir(notas, backend, modo):
+    """
+    Retorna o melhor tempo (s) entre as repetições para extrair todas as notas.
+    """
+    melhor = float("inf")
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        extrair(notas, backend, modo)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    if lxml_etree is None:
+        print("lxml não está instalado: só o backend stdlib está disponível.")
+        return
+
+    notas = [gerar_nota_xml(n, ITENS_POR_NOTA) for n in range(1, TOTAL_NOTAS + 1)]
+    total_itens = TOTAL_NOTAS * ITENS_POR_NOTA
+    backends_originais = processar_xml_nfe.BACKEND, processar_xml_nfe.BACKEND_STREAMING
+
+    try:
+        # Paridade: mesmas linhas, na mesma ordem, nos dois backends
+        for modo in EXTRATORES:
+            if extrair(notas, "stdlib", modo) != extrair(notas, "lxml", modo):
+                raise AssertionError(f"Backends divergem no modo {modo}")
+        print(f"Paridade OK: {TOTAL_NOTAS} notas, {total_itens} itens, modos {list(EXTRATORES)}")
+
+        print(f"\nMelhor de {REPETICOES} rodadas")
+        for modo in EXTRATORES:
+            for backend in ("stdlib", "lxml"):
+                tempo = medir(notas, backend, modo)
+                print(
+                    f"{modo:<10} {backend:<7} {tempo:.3f}s -> "
+                    f"{TOTAL_NOTAS / tempo:,.0f} notas/s | {total_itens / tempo:,.0f} itens/s"
+                )
+    finally:
+        processar_xml_nfe.BACKEND, processar_xml_nfe.BACKEND_STREAMING = backends_originais
+
+
+if __name__ == "__main__":
+    main()
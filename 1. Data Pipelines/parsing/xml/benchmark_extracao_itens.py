@@ -0,0 +1,73 @@
+"""
+Compara os motores de extração de itens de processar_xml_nfe.py
+(findtext por coluna x passagem única) sobre itens sintéticos realistas.
+Confere que os dois motores geram as mesmas linhas antes de medir.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+import time
+import xml.etree.ElementTree as ET
+
+from gerar_nfe_sintetica import gerar_det_xml
+from processar_xml_nfe import (
+    NS_NFE,
+    compilar_plano,
+    _extrair_item_findtext,
+    _extrair_item_passagem_unica,
+)
+
+# Quantidade de itens e repetições do benchmark
+TOTAL_ITENS = 2000
+REPETICOES = 5
+
+
+def montar_det(n_item):
+    """
+    Monta um det sintético (ICMS normal/ST, IPI, PIS e COFINS) como elemento.
+    """
+    xml, _ = gerar_det_xml(n_item)
+    return ET.fromstring(xml.replace("<det ", f'<det xmlns="{NS_NFE}" ', 1))
+
+
+def medir(motor, dets, argumento):
+    """
+    Retorna o melhor tempo (s) entre as repetições para extrair todos os itens.
+    """
+    melhor = float("inf")
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        for det in dets:
+            motor(det, argumento)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    plano = compilar_plano()
+    plano_item = plano["item"]
+    campos_findtext = plano["item_findtext"]
+    dets = [montar_det(n) for n in range(1, TOTAL_ITENS + 1)]
+
+    for det in dets:
+        if _extrair_item_findtext(det, campos_findtext) != _extrair_item_passagem_unica(det, plano_item):
+            raise AssertionError(f"Motores divergem no item {det.attrib['nItem']}")
+
+    tempo_findtext = medir(_extrair_item_findtext, dets, campos_findtext)
+    tempo_passagem = medir(_extrair_item_passagem_unica, dets, plano_item)
+
+    # Projeção: só as colunas de ICMS, como nos jobs que não precisam do resto
+    plano_icms = compilar_plano([c for c in plano_item[0] if c.startswith("ICMS_")])["item"]
+    tempo_icms = medir(_extrair_item_passagem_unica, dets, plano_icms)
+
+    print(f"Itens por rodada: {TOTAL_ITENS} (melhor de {REPETICOES})")
+    print(f"findtext:        {tempo_findtext:.4f}s -> {TOTAL_ITENS / tempo_findtext:,.0f} itens/s")
+    print(f"passagem_unica:  {tempo_passagem:.4f}s -> {TOTAL_ITENS / tempo_passagem:,.0f} itens/s")
+    print(f"Ganho: {tempo_findtext / tempo_passagem:.1f}x")
+    print(f"passagem_unica (só ICMS): {tempo_icms:.4f}s -> {TOTAL_ITENS / tempo_icms:,.0f} itens/s")
+
+
+if __name__ == "__main__":
+    main()
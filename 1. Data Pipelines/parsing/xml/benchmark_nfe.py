@@ -0,0 +1,154 @@
+"""
+Suite de benchmark do processar_xml_nfe.py sobre NF-e sintéticas.
+Mede arquivos/s, itens/s e pico de memória de cada modo de extração e
+compara com uma execução de referência salva em JSON, apontando regressões.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from gerar_nfe_sintetica import gerar_pasta
+from processar_xml_nfe import (
+    agregar_impostos,
+    extrair_dados_xml_pandas,
+    extrair_dados_xml_streaming,
+    iterar_blocos,
+    processar_arquivos,
+    processar_arquivos_normalizado,
+)
+
+# Tamanho da massa sintética: notas e intervalo de itens por nota
+TOTAL_NOTAS = int(os.getenv("NFE_BENCH_NOTAS", "300"))
+ITENS_POR_NOTA = (
+    int(os.getenv("NFE_BENCH_ITENS_MIN", "1")),
+    int(os.getenv("NFE_BENCH_ITENS_MAX", "120")),
+)
+WORKERS = int(os.getenv("NFE_BENCH_WORKERS", str(os.cpu_count() or 2)))
+
+# Rodadas cronometradas por cenário (vale a melhor, para reduzir ruído)
+REPETICOES = int(os.getenv("NFE_BENCH_REPETICOES", "3"))
+
+# Resultado desta execução (por padrão ao lado deste script, seja qual for
+# a pasta de onde ele é rodado) e referência para detectar regressões
+ARQUIVO_RESULTADO = os.getenv(
+    "NFE_BENCH_RESULTADO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_nfe.json"),
+)
+ARQUIVO_REFERENCIA = os.getenv("NFE_BENCH_REFERENCIA", "")
+TOLERANCIA_REGRESSAO = float(os.getenv("NFE_BENCH_TOLERANCIA", "0.10"))
+
+COLUNAS_ICMS = ["chave_acesso", "nItem", "CFOP", "ICMS_CST", "ICMS_vBC", "ICMS_vICMS"]
+
+# Cenários medidos: nome -> função que recebe a lista de caminhos.
+# Novos modos do parser entram aqui para serem acompanhados.
+CENARIOS = {
+    "extrair_dados_xml_pandas": lambda caminhos: [extrair_dados_xml_pandas(c) for c in caminhos],
+    "extrair_dados_xml_streaming": lambda caminhos: [extrair_dados_xml_streaming(c) for c in caminhos],
+    "processar_arquivos": lambda caminhos: processar_arquivos(caminhos),
+    "processar_arquivos (tipado)": lambda caminhos: processar_arquivos(caminhos, tipado=True),
+    "processar_arquivos (só ICMS)": lambda caminhos: processar_arquivos(caminhos, colunas=COLUNAS_ICMS),
+    "processar_arquivos (streaming)": lambda caminhos: processar_arquivos(caminhos, modo="streaming"),
+    "processar_arquivos_normalizado": lambda caminhos: processar_arquivos_normalizado(caminhos),
+    "iterar_blocos (5000 linhas)": (
+        lambda caminhos: sum(len(df) for df in iterar_blocos(caminhos, tamanho_bloco=5000))
+    ),
+    "agregar_impostos": lambda caminhos: agregar_impostos(caminhos),
+    "agregar_impostos (streaming)": lambda caminhos: agregar_impostos(caminhos, modo="streaming"),
+    f"processar_arquivos ({WORKERS} workers)": (
+        lambda caminhos: processar_arquivos(caminhos, workers=WORKERS, tamanho_lote=16)
+    ),
+}
+
+
+def contar_itens(caminhos):
+    """
+    Conta os itens da massa (usado para calcular itens/s).
+    """
+    return len(processar_arquivos(caminhos, colunas=["nItem"]))
+
+
+def medir_cenario(funcao, caminhos):
+    """
+    Cronometra o cenário (melhor de REPETICOES) e roda mais uma vez com
+    tracemalloc, que deixa a execução mais lenta mas mede o pico de memória
+    Python do processo principal (workers do pool não entram na conta).
+    """
+    tempo = float("inf")
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao(caminhos)
+        tempo = min(tempo, time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    try:
+        funcao(caminhos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return tempo, pico
+
+
+def comparar_com_referencia(resultados, referencia):
+    """
+    Imprime a variação de arquivos/s e memória em relação à referência e
+    devolve os cenários que ficaram mais lentos que a tolerância.
+    """
+    regressoes = []
+    print(f"\nComparação com {ARQUIVO_REFERENCIA} (tolerância {TOLERANCIA_REGRESSAO:.0%})")
+    for nome, atual in resultados.items():
+        anterior = referencia.get(nome)
+        if anterior is None:
+            print(f"  {nome:<40} (sem referência)")
+            continue
+        variacao = atual["arquivos_s"] / anterior["arquivos_s"] - 1
+        variacao_memoria = atual["pico_mb"] / anterior["pico_mb"] - 1 if anterior["pico_mb"] else 0
+        status = "REGRESSÃO" if variacao < -TOLERANCIA_REGRESSAO else "ok"
+        if status != "ok":
+            regressoes.append(nome)
+        print(f"  {nome:<40} {variacao:+7.1%} arquivos/s | {variacao_memoria:+7.1%} memória  {status}")
+    return regressoes
+
+
+def main():
+    with tempfile.TemporaryDirectory(prefix="nfe_bench_") as pasta:
+        caminhos = gerar_pasta(pasta, TOTAL_NOTAS, ITENS_POR_NOTA)
+        total_itens = contar_itens(caminhos)
+        tamanho_mb = sum(os.path.getsize(c) for c in caminhos) / 1024 ** 2
+        print(f"Massa: {TOTAL_NOTAS} notas | {total_itens} itens | {tamanho_mb:.1f} MB\n")
+
+        resultados = {}
+        for nome, funcao in CENARIOS.items():
+            tempo, pico = medir_cenario(funcao, caminhos)
+            resultados[nome] = {
+                "segundos": round(tempo, 4),
+                "arquivos_s": round(len(caminhos) / tempo, 1),
+                "itens_s": round(total_itens / tempo, 1),
+                "pico_mb": round(pico / 1024 ** 2, 2),
+            }
+            r = resultados[nome]
+            print(
+                f"{nome:<40} {r['segundos']:8.3f}s | {r['arquivos_s']:>9,.1f} arquivos/s | "
+                f"{r['itens_s']:>11,.1f} itens/s | pico {r['pico_mb']:>8.2f} MB"
+            )
+
+    with open(ARQUIVO_RESULTADO, "w", encoding="utf-8") as arquivo:
+        json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultado salvo em {ARQUIVO_RESULTADO}")
+
+    if ARQUIVO_REFERENCIA and os.path.exists(ARQUIVO_REFERENCIA):
+        with open(ARQUIVO_REFERENCIA, encoding="utf-8") as arquivo:
+            regressoes = comparar_com_referencia(resultados, json.load(arquivo))
+        if regressoes:
+            raise SystemExit(f"❌ Regressão de desempenho em: {', '.join(regressoes)}")
+
+
+if __name__ == "__main__":
+    main()
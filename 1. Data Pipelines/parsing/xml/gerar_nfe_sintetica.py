@@ -0,0 +1,231 @@
+"""
+Gera XMLs sintéticos de NF-e (nfeProc, leiaute 4.00) para testes e
+benchmarks do processar_xml_nfe.py, sem depender de notas reais.
+Quantidade de notas, itens por nota e grupos de imposto são configuráveis;
+a chave de acesso tem dígito verificador válido e os totais fecham.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+import os
+import random
+
+NS_NFE = 'http://www.portalfiscal.inf.br/nfe'
+
+# Grupos de imposto que podem aparecer nos itens
+GRUPOS_IMPOSTO = ("ICMS", "ICMS_ST", "IPI", "PIS", "COFINS")
+
+# Configuração padrão do main()
+DESTINO = os.getenv("NFE_SINTETICA_DESTINO", "./data/nfe_sintetica")
+TOTAL_NOTAS = int(os.getenv("NFE_SINTETICA_NOTAS", "1000"))
+ITENS_POR_NOTA = int(os.getenv("NFE_SINTETICA_ITENS", "30"))
+SEMENTE = int(os.getenv("NFE_SINTETICA_SEMENTE", "42"))
+
+UFS = [("35", "SP", "3550308"), ("33", "RJ", "3304557"), ("31", "MG", "3106200"),
+       ("41", "PR", "4106902"), ("43", "RS", "4314902"), ("29", "BA", "2927408")]
+
+PRODUTOS = [
+    ("CERVEJA LATA 350ML", "22030000", "0302100", "5405", "UN"),
+    ("REFRIGERANTE PET 2L", "22021000", "0300700", "5405", "UN"),
+    ("BISCOITO RECHEADO 140G", "19053100", "1700700", "5102", "UN"),
+    ("ARROZ TIPO 1 5KG", "10063021", "", "5102", "PCT"),
+    ("DETERGENTE LIQUIDO 500ML", "34022000", "1100100", "5102", "UN"),
+    ("CAFE TORRADO 500G", "09012100", "", "6102", "PCT"),
+    ("OLEO DE SOJA 900ML", "15079011", "", "6102", "UN"),
+    ("SABAO EM PO 1KG", "34022000", "1100200", "6403", "CX"),
+]
+
+
+def calcular_dv_chave(chave_sem_dv):
+    """
+    Dígito verificador (módulo 11) dos 43 primeiros dígitos da chave.
+    """
+    soma, peso = 0, 2
+    for digito in reversed(chave_sem_dv):
+        soma += int(digito) * peso
+        peso = 2 if peso == 9 else peso + 1
+    resto = soma % 11
+    return "0" if resto < 2 else str(11 - resto)
+
+
+def _icms_xml(grupos, aleatorio, v_prod):
+    """
+    Monta o grupo ICMS do item e devolve (xml, vBC, vICMS, vST).
+    ICMS-ST alterna entre ICMS10 (com ST na nota) e ICMS60 (ST retido).
+    """
+    usa_st = "ICMS_ST" in grupos and ("ICMS" not in grupos or aleatorio.random() < 0.3)
+    if usa_st and aleatorio.random() < 0.5:
+        v_icms = round(v_prod * 0.18, 2)
+        v_bc_st = round(v_prod * 1.4, 2)
+        v_st = round(v_bc_st * 0.18 - v_icms, 2)
+        return (
+            f"<ICMS10><orig>0</orig><CST>10</CST><modBC>3</modBC><vBC>{v_prod:.2f}</vBC>"
+            f"<pICMS>18.00</pICMS><vICMS>{v_icms:.2f}</vICMS><modBCST>4</modBCST>"
+            f"<pMVAST>40.00</pMVAST><vBCST>{v_bc_st:.2f}</vBCST><pICMSST>18.00</pICMSST>"
+            f"<vICMSST>{v_st:.2f}</vICMSST></ICMS10>",
+            v_prod, v_icms, v_st,
+        )
+    if usa_st:
+        v_ret = round(v_prod * 1.4, 2)
+        return (
+            f"<ICMS60><orig>0</orig><CST>60</CST><vBCSTRet>{v_ret:.2f}</vBCSTRet>"
+            f"<pST>18.00</pST><vICMSSubstituto>{v_prod * 0.18:.2f}</vICMSSubstituto>"
+            f"<vICMSSTRet>{v_ret * 0.18 - v_prod * 0.18:.2f}</vICMSSTRet>"
+            f"<pRedBCEfet>0.00</pRedBCEfet><vBCEfet>{v_prod:.2f}</vBCEfet>"
+            f"<pICMSEfet>18.00</pICMSEfet><vICMSEfet>{v_prod * 0.18:.2f}</vICMSEfet></ICMS60>",
+            0.0, 0.0, 0.0,
+        )
+    if "ICMS" in grupos:
+        v_icms = round(v_prod * 0.18, 2)
+        return (
+            f"<ICMS00><orig>0</orig><CST>00</CST><modBC>3</modBC><vBC>{v_prod:.2f}</vBC>"
+            f"<pICMS>18.00</pICMS><vICMS>{v_icms:.2f}</vICMS></ICMS00>",
+            v_prod, v_icms, 0.0,
+        )
+    # Sem ICMS configurado: emitente do Simples Nacional
+    return "<ICMSSN102><orig>0</orig><CSOSN>102</CSOSN></ICMSSN102>", 0.0, 0.0, 0.0
+
+
+def gerar_det_xml(n_item, grupos=GRUPOS_IMPOSTO, aleatorio=None):
+    """
+    Monta o texto de um det e devolve (xml, totais do item).
+    """
+    aleatorio = aleatorio or random.Random(n_item)
+    x_prod, ncm, cest, cfop, unidade = aleatorio.choice(PRODUTOS)
+    q_com = aleatorio.randint(1, 48)
+    v_un = round(aleatorio.uniform(2, 80), 2)
+    v_prod = round(q_com * v_un, 2)
+
+    icms, v_bc, v_icms, v_st = _icms_xml(grupos, aleatorio, v_prod)
+    impostos = [f"<vTotTrib>{v_prod * 0.3:.2f}</vTotTrib>", f"<ICMS>{icms}</ICMS>"]
+
+    v_ipi = 0.0
+    if "IPI" in grupos:
+        if aleatorio.random() < 0.7:
+            v_ipi = round(v_prod * 0.05, 2)
+            impostos.append(
+                f"<IPI><cEnq>999</cEnq><IPITrib><CST>50</CST><vBC>{v_prod:.2f}</vBC>"
+                f"<pIPI>5.00</pIPI><vIPI>{v_ipi:.2f}</vIPI></IPITrib></IPI>"
+            )
+        else:
+            impostos.append("<IPI><cEnq>999</cEnq><IPINT><CST>53</CST></IPINT></IPI>")
+
+    v_pis = v_cofins = 0.0
+    if "PIS" in grupos:
+        v_pis = round(v_prod * 0.0165, 2)
+        impostos.append(
+            f"<PIS><PISAliq><CST>01</CST><vBC>{v_prod:.2f}</vBC><pPIS>1.65</pPIS>"
+            f"<vPIS>{v_pis:.2f}</vPIS></PISAliq></PIS>"
+        )
+    if "COFINS" in grupos:
+        v_cofins = round(v_prod * 0.076, 2)
+        impostos.append(
+            f"<COFINS><COFINSAliq><CST>01</CST><vBC>{v_prod:.2f}</vBC><pCOFINS>7.60</pCOFINS>"
+            f"<vCOFINS>{v_cofins:.2f}</vCOFINS></COFINSAliq></COFINS>"
+        )
+
+    cest_xml = f"<CEST>{cest}</CEST>" if cest else ""
+    xml = (
+        f'<det nItem="{n_item}"><prod><cProd>{aleatorio.randint(1, 99999):06d}</cProd>'
+        f"<cEAN>SEM GTIN</cEAN><xProd>{x_prod}</xProd><NCM>{ncm}</NCM>{cest_xml}"
+        f"<CFOP>{cfop}</CFOP><uCom>{unidade}</uCom><qCom>{q_com:.4f}</qCom>"
+        f"<vUnCom>{v_un:.10f}</vUnCom><vProd>{v_prod:.2f}</vProd><cEANTrib>SEM GTIN</cEANTrib>"
+        f"<uTrib>{unidade}</uTrib><qTrib>{q_com:.4f}</qTrib><vUnTrib>{v_un:.10f}</vUnTrib>"
+        f"<indTot>1</indTot></prod><imposto>{''.join(impostos)}</imposto>"
+        f"<infAdProd>ITEM {n_item}</infAdProd></det>"
+    )
+    totais = {"vProd": v_prod, "vBC": v_bc, "vICMS": v_icms, "vST": v_st,
+              "vIPI": v_ipi, "vPIS": v_pis, "vCOFINS": v_cofins}
+    return xml, totais
+
+
+def gerar_nota_xml(n_nota, n_itens, grupos=GRUPOS_IMPOSTO, semente=SEMENTE):
+    """
+    Gera uma NF-e autorizada (nfeProc) com `n_itens` itens, em bytes.
+    A mesma semente e o mesmo número de nota geram sempre o mesmo XML.
+    """
+    aleatorio = random.Random(semente * 1_000_003 + n_nota)
+    c_uf, uf_emit, c_mun_emit = aleatorio.choice(UFS)
+    _, uf_dest, c_mun_dest = aleatorio.choice(UFS)
+    mes = 1 + n_nota % 12
+    cnpj_emit = f"{aleatorio.randint(10**13, 10**14 - 1)}"
+    c_nf = f"{aleatorio.randint(0, 10**8 - 1):08d}"
+
+    chave = f"{c_uf}25{mes:02d}{cnpj_emit}55001{n_nota:09d}1{c_nf}"
+    chave += calcular_dv_chave(chave)
+
+    dets, soma = [], dict.fromkeys(("vProd", "vBC", "vICMS", "vST", "vIPI", "vPIS", "vCOFINS"), 0.0)
+    for n_item in range(1, n_itens + 1):
+        xml_det, totais = gerar_det_xml(n_item, grupos, aleatorio)
+        dets.append(xml_det)
+        for campo, valor in totais.items():
+            soma[campo] += valor
+    v_nf = soma["vProd"] + soma["vST"] + soma["vIPI"]
+
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<nfeProc xmlns="{NS_NFE}" versao="4.00"><NFe><infNFe Id="NFe{chave}" versao="4.00">'
+        f"<ide><cUF>{c_uf}</cUF><cNF>{c_nf}</cNF><natOp>VENDA DE MERCADORIA</natOp><mod>55</mod>"
+        f"<serie>1</serie><nNF>{n_nota}</nNF><dhEmi>2025-{mes:02d}-{1 + n_nota % 28:02d}T"
+        f"{8 + n_nota % 12:02d}:15:00-03:00</dhEmi><tpNF>1</tpNF>"
+        f"<idDest>{1 if uf_emit == uf_dest else 2}</idDest><cMunFG>{c_mun_emit}</cMunFG>"
+        f"<tpImp>1</tpImp><tpEmis>1</tpEmis><cDV>{chave[-1]}</cDV><tpAmb>1</tpAmb>"
+        f"<finNFe>1</finNFe><indFinal>0</indFinal><indPres>1</indPres><procEmi>0</procEmi>"
+        f"<verProc>1.0</verProc></ide>"
+        f"<emit><CNPJ>{cnpj_emit}</CNPJ><xNome>EMITENTE {cnpj_emit[:6]} LTDA</xNome>"
+        f"<enderEmit><xLgr>RUA DAS INDUSTRIAS</xLgr><nro>100</nro><xBairro>CENTRO</xBairro>"
+        f"<cMun>{c_mun_emit}</cMun><xMun>MUNICIPIO</xMun><UF>{uf_emit}</UF><CEP>01000000</CEP>"
+        f"<cPais>1058</cPais><xPais>BRASIL</xPais></enderEmit><IE>123456789</IE><CRT>3</CRT></emit>"
+        f"<dest><CNPJ>{aleatorio.randint(10**13, 10**14 - 1)}</CNPJ><xNome>DESTINATARIO SA</xNome>"
+        f"<enderDest><xLgr>AVENIDA BRASIL</xLgr><nro>2000</nro><xBairro>CENTRO</xBairro>"
+        f"<cMun>{c_mun_dest}</cMun><xMun>MUNICIPIO</xMun><UF>{uf_dest}</UF><CEP>20000000</CEP>"
+        f"<cPais>1058</cPais><xPais>BRASIL</xPais></enderDest><indIEDest>1</indIEDest></dest>"
+        f"{''.join(dets)}"
+        f"<total><ICMSTot><vBC>{soma['vBC']:.2f}</vBC><vICMS>{soma['vICMS']:.2f}</vICMS>"
+        f"<vICMSDeson>0.00</vICMSDeson><vFCP>0.00</vFCP><vBCST>0.00</vBCST><vST>{soma['vST']:.2f}</vST>"
+        f"<vFCPST>0.00</vFCPST><vFCPSTRet>0.00</vFCPSTRet><vProd>{soma['vProd']:.2f}</vProd>"
+        f"<vFrete>0.00</vFrete><vSeg>0.00</vSeg><vDesc>0.00</vDesc><vII>0.00</vII>"
+        f"<vIPI>{soma['vIPI']:.2f}</vIPI><vIPIDevol>0.00</vIPIDevol><vPIS>{soma['vPIS']:.2f}</vPIS>"
+        f"<vCOFINS>{soma['vCOFINS']:.2f}</vCOFINS><vOutro>0.00</vOutro><vNF>{v_nf:.2f}</vNF>"
+        f"</ICMSTot></total>"
+        f"<transp><modFrete>0</modFrete></transp>"
+        f"<pag><detPag><tPag>15</tPag><vPag>{v_nf:.2f}</vPag></detPag></pag>"
+        f"<infAdic><infCpl>NOTA SINTETICA PARA TESTES</infCpl></infAdic>"
+        f"</infNFe></NFe>"
+        f"<protNFe versao=\"4.00\"><infProt><tpAmb>1</tpAmb><verAplic>SP_NFE_PL_009_V4</verAplic>"
+        f"<chNFe>{chave}</chNFe><dhRecbto>2025-{mes:02d}-01T08:00:00-03:00</dhRecbto>"
+        f"<nProt>1352500000{n_nota:05d}</nProt><cStat>100</cStat>"
+        f"<xMotivo>Autorizado o uso da NF-e</xMotivo></infProt></protNFe></nfeProc>"
+    ).encode("utf-8")
+
+
+def gerar_pasta(destino, total_notas, itens_por_nota, grupos=GRUPOS_IMPOSTO, semente=SEMENTE):
+    """
+    Grava `total_notas` XMLs em `destino` e devolve a lista de caminhos.
+    `itens_por_nota` pode ser um inteiro ou um intervalo (mínimo, máximo).
+    """
+    os.makedirs(destino, exist_ok=True)
+    aleatorio = random.Random(semente)
+
+    caminhos = []
+    for n_nota in range(1, total_notas + 1):
+        if isinstance(itens_por_nota, tuple):
+            n_itens = aleatorio.randint(*itens_por_nota)
+        else:
+            n_itens = itens_por_nota
+        caminho = os.path.join(destino, f"NFe_{n_nota:07d}.xml")
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(gerar_nota_xml(n_nota, n_itens, grupos, semente))
+        caminhos.append(caminho)
+    return caminhos
+
+
+def main():
+    caminhos = gerar_pasta(DESTINO, TOTAL_NOTAS, ITENS_POR_NOTA)
+    print(f"✅ {len(caminhos)} NF-e sintéticas geradas em {os.path.abspath(DESTINO)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Grava os itens de NF-e extraídos por processar_xml_nfe.py em Parquet
+particionado por mês de emissão e UF do emitente (ano_mes=AAAA-MM/uf=SP).
+Os lotes são gravados à medida que ficam prontos, com tipos e compressão,
+para que as cargas e análises leiam só as partições e colunas necessárias.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+# Para instalar as dependências necessárias, use o seguinte comando:
+# pip install pandas pyarrow
+
+import os
+import shutil
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from metricas_nfe import ColetorMetricas
+from processar_xml_nfe import (
+    METRICAS,
+    MODO_EXTRACAO,
+    PASTAS_XML,
+    QUARENTENA,
+    SEPARADOR_PACOTE,
+    TAMANHO_LOTE,
+    TIPOS_COLUNAS,
+    WORKERS,
+    COLUNAS,
+    compilar_plano,
+    iterar_dataframes,
+    listar_arquivos_nfe,
+    tipar_dataframe,
+)
+
+# Pasta raiz do dataset Parquet e codec de compressão
+DESTINO_PARQUET = os.getenv("NFE_DESTINO_PARQUET", "./data/nfe_parquet")
+COMPRESSAO = os.getenv("NFE_COMPRESSAO_PARQUET", "zstd")
+
+COLUNAS_PARTICAO = ["ano_mes", "uf"]
+
+TIPOS_ARROW = {
+    "numero": pa.float64(),
+    "inteiro": pa.int64(),
+    "data": pa.timestamp("us", tz="UTC"),
+    "categoria": pa.dictionary(pa.int32(), pa.string()),
+}
+
+
+def esquema_arrow(colunas):
+    """
+    Monta o esquema Arrow das colunas a partir de TIPOS_COLUNAS, para que
+    todos os arquivos do dataset tenham o mesmo tipo por coluna, mesmo
+    quando um lote vem com uma coluna inteira vazia.
+    """
+    campos = [
+        pa.field(coluna, TIPOS_ARROW.get(TIPOS_COLUNAS.get(coluna), pa.string()))
+        for coluna in colunas
+    ]
+    campos += [pa.field(coluna, pa.string()) for coluna in COLUNAS_PARTICAO]
+    return pa.schema(campos)
+
+
+def _publicar_lote(preparo, destino):
+    """
+    Move os arquivos de um lote já gravado em `preparo` para as mesmas
+    partições em `destino`.
+    """
+    for raiz, _, nomes in os.walk(preparo):
+        pasta = os.path.join(destino, os.path.relpath(raiz, preparo))
+        os.makedirs(pasta, exist_ok=True)
+        for nome in nomes:
+            os.replace(os.path.join(raiz, nome), os.path.join(pasta, nome))
+
+
+def gravar_parquet_particionado(caminhos, destino=DESTINO_PARQUET, modo=MODO_EXTRACAO, workers=1,
+                                tamanho_lote=64, colunas=None, compressao=COMPRESSAO, erros=None,
+                                metricas=None, ao_gravar=None):
+    """
+    Extrai os arquivos lote a lote e acrescenta cada lote ao dataset
+    Parquet em `destino`. dhEmi e UF_emit entram sempre na extração, pois
+    definem as partições. Use a mesma seleção de colunas em todas as
+    gravações de um mesmo destino. Devolve (lotes_gravados, linhas_gravadas);
+    os arquivos com erro vão para a lista `erros` e as métricas por arquivo
+    para `metricas` (ColetorMetricas), quando informados.
+
+    Cada lote é gravado numa pasta de preparo ("_preparo-*", ignorada por
+    quem lê o dataset) e só então movido para as partições, para que uma
+    falha no meio da gravação não deixe o lote pela metade no destino.
+    `ao_gravar(caminhos_lote)` é chamado depois de cada lote publicado (e
+    dos lotes sem linhas), para que o chamador registre o progresso.
+    """
+    if colunas is not None:
+        colunas = list(dict.fromkeys(["dhEmi", "UF_emit", *colunas]))
+    colunas_plano = compilar_plano(colunas)["colunas"]
+    esquema = esquema_arrow(colunas_plano)
+
+    execucao = uuid.uuid4().hex[:12]
+    total_lotes = total_linhas = 0
+
+    concluidos = []
+    for df in iterar_dataframes(caminhos, modo, workers, tamanho_lote, colunas, erros=erros,
+                                metricas=metricas, concluidos=concluidos):
+        # Partição a partir do texto original: o mês é o da data local de emissão
+        ano_mes = df["dhEmi"].str[:7].fillna("").replace("", "sem_data")
+        uf = df["UF_emit"].fillna("").replace("", "sem_uf")
+
+        df = tipar_dataframe(df)
+        df["ano_mes"] = ano_mes
+        df["uf"] = uf
+
+        tabela = pa.Table.from_pandas(df, schema=esquema, preserve_index=False)
+        preparo = os.path.join(destino, f"_preparo-{execucao}-{total_lotes:05d}")
+        try:
+            pq.write_to_dataset(
+                tabela,
+                root_path=preparo,
+                partition_cols=COLUNAS_PARTICAO,
+                basename_template=f"nfe-{execucao}-{total_lotes:05d}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+                compression=compressao,
+            )
+            _publicar_lote(preparo, destino)
+        finally:
+            shutil.rmtree(preparo, ignore_errors=True)
+        total_lotes += 1
+        total_linhas += len(df)
+
+        if ao_gravar is not None:
+            ao_gravar(list(concluidos))
+        concluidos.clear()
+
+    if ao_gravar is not None and concluidos:
+        ao_gravar(list(concluidos))
+
+    return total_lotes, total_linhas
+
+
+def main():
+    arquivos_xml = []
+    for pasta in PASTAS_XML:
+        arquivos_xml.extend(listar_arquivos_nfe(pasta))
+
+    with ColetorMetricas(METRICAS, QUARENTENA, SEPARADOR_PACOTE) as metricas:
+        lotes, linhas = gravar_parquet_particionado(
+            arquivos_xml,
+            workers=WORKERS,
+            tamanho_lote=TAMANHO_LOTE,
+            colunas=COLUNAS,
+            metricas=metricas,
+        )
+
+        print("Processamento finalizado com sucesso.")
+        print(f"Total de arquivos XML/pacotes encontrados: {len(arquivos_xml)}")
+        print(f"Lotes gravados: {lotes} | Linhas gravadas: {linhas}")
+        print(f"Dataset Parquet em: {os.path.abspath(DESTINO_PARQUET)}")
+        metricas.imprimir_resumo()
+
+
+if __name__ == "__main__":
+    main()
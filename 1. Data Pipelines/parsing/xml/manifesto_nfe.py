@@ -0,0 +1,162 @@
+"""
+Manifesto SQLite dos XMLs de NF-e já processados.
+Guarda caminho, tamanho, mtime e hash de cada arquivo (XML ou pacote) e as
+chaves de acesso já carregadas, para que processar_xml_nfe.py processe só
+o que mudou.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+
+
+def abrir_manifesto(caminho_db):
+    """
+    Abre (ou cria) o banco SQLite do manifesto.
+    """
+    pasta = os.path.dirname(os.path.abspath(caminho_db))
+    os.makedirs(pasta, exist_ok=True)
+
+    conexao = sqlite3.connect(caminho_db)
+    conexao.executescript("""
+        CREATE TABLE IF NOT EXISTS arquivos (
+            caminho       TEXT PRIMARY KEY,
+            tamanho       INTEGER NOT NULL,
+            mtime_ns      INTEGER NOT NULL,
+            hash          TEXT NOT NULL,
+            chave_acesso  TEXT,
+            processado_em TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_arquivos_hash ON arquivos (hash);
+
+        CREATE TABLE IF NOT EXISTS notas (
+            chave_acesso  TEXT PRIMARY KEY,
+            caminho       TEXT NOT NULL,
+            processado_em TEXT NOT NULL
+        );
+    """)
+    return conexao
+
+
+def calcular_hash(caminho, tamanho_bloco=1024 * 1024):
+    """
+    Calcula o SHA-256 do conteúdo do arquivo lendo em blocos.
+    """
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def filtrar_pendentes(conexao, caminhos):
+    """
+    Devolve os arquivos novos ou alterados como dicts com caminho, tamanho,
+    mtime_ns e hash.
+
+    Tamanho e mtime iguais ao manifesto descartam o arquivo sem lê-lo. Se
+    só os metadados mudaram (cópia, touch) o hash confirma o conteúdo e o
+    arquivo também é descartado. Conteúdo idêntico a outro arquivo já
+    processado (mesmo hash em outro caminho) é descartado sem parse.
+    """
+    conhecidos = {
+        caminho: (tamanho, mtime_ns, hash_)
+        for caminho, tamanho, mtime_ns, hash_ in conexao.execute(
+            "SELECT caminho, tamanho, mtime_ns, hash FROM arquivos"
+        )
+    }
+
+    pendentes = []
+    hashes_vistos = set()
+    for caminho in caminhos:
+        stat = os.stat(caminho)
+        anterior = conhecidos.get(caminho)
+        if anterior and anterior[:2] == (stat.st_size, stat.st_mtime_ns):
+            continue
+
+        hash_ = calcular_hash(caminho)
+        if anterior and anterior[2] == hash_:
+            conexao.execute(
+                "UPDATE arquivos SET tamanho = ?, mtime_ns = ? WHERE caminho = ?",
+                (stat.st_size, stat.st_mtime_ns, caminho),
+            )
+            continue
+
+        if hash_ in hashes_vistos:
+            continue
+        hashes_vistos.add(hash_)
+
+        original = conexao.execute(
+            "SELECT chave_acesso FROM arquivos WHERE hash = ? AND caminho <> ? LIMIT 1",
+            (hash_, caminho),
+        ).fetchone()
+        if original:
+            # Registra a cópia para não recalcular o hash nas próximas execuções
+            conexao.execute(
+                """
+                INSERT OR REPLACE INTO arquivos
+                    (caminho, tamanho, mtime_ns, hash, chave_acesso, processado_em)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (caminho, stat.st_size, stat.st_mtime_ns, hash_, original[0],
+                 datetime.now().isoformat(timespec="seconds")),
+            )
+            continue
+
+        pendentes.append({
+            "caminho": caminho,
+            "tamanho": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": hash_,
+        })
+
+    conexao.commit()
+    return pendentes
+
+
+def chaves_processadas(conexao, chaves):
+    """
+    Devolve {chave_acesso: caminho} das chaves que já constam no manifesto.
+    """
+    encontradas = {}
+    chaves = list(chaves)
+    # Consulta em blocos para respeitar o limite de parâmetros do SQLite
+    for inicio in range(0, len(chaves), 500):
+        bloco = chaves[inicio:inicio + 500]
+        marcadores = ", ".join("?" * len(bloco))
+        encontradas.update(conexao.execute(
+            f"SELECT chave_acesso, caminho FROM notas WHERE chave_acesso IN ({marcadores})",
+            bloco,
+        ))
+    return encontradas
+
+
+def registrar_processados(conexao, arquivos, notas=()):
+    """
+    Grava no manifesto os arquivos processados e as notas carregadas.
+    Cada arquivo traz os campos de filtrar_pendentes mais a chave_acesso
+    (None para pacotes); `notas` são pares (chave_acesso, origem), onde a
+    origem pode ser um membro de pacote.
+    """
+    agora = datetime.now().isoformat(timespec="seconds")
+    with conexao:
+        conexao.executemany(
+            """
+            INSERT OR REPLACE INTO arquivos
+                (caminho, tamanho, mtime_ns, hash, chave_acesso, processado_em)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (a["caminho"], a["tamanho"], a["mtime_ns"], a["hash"], a.get("chave_acesso"), agora)
+                for a in arquivos
+            ],
+        )
+        conexao.executemany(
+            "INSERT OR IGNORE INTO notas (chave_acesso, caminho, processado_em) VALUES (?, ?, ?)",
+            [(chave, origem, agora) for chave, origem in notas],
+        )
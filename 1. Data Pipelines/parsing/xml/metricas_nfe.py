@@ -0,0 +1,199 @@
+"""
+Métricas por arquivo e quarentena de erros do processar_xml_nfe.py.
+Registra tempo de parse, itens, bytes e resultado da validação XSD de cada
+XML (opcionalmente em CSV), move os arquivos com erro para uma pasta de
+quarentena com um manifesto JSON Lines do motivo e monta o resumo da
+execução com percentis de latência e vazão, para achar as notas que
+derrubam o throughput.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+import csv
+import heapq
+import json
+import os
+import shutil
+import time
+from array import array
+from datetime import datetime
+
+# Manifesto dos arquivos em quarentena, dentro da própria pasta
+MANIFESTO_QUARENTENA = "erros_quarentena.jsonl"
+
+PERCENTIS = (50, 90, 99)
+
+
+def percentil(ordenados, p):
+    """
+    Percentil p (0-100) pelo método do posto mais próximo, sobre uma
+    sequência já ordenada.
+    """
+    if not ordenados:
+        return 0.0
+    posto = max(1, -(-p * len(ordenados) // 100))
+    return ordenados[posto - 1]
+
+
+def mover_para_quarentena(nome, erro, pasta_quarentena, separador_pacote="::"):
+    """
+    Tira o arquivo com erro da pasta de entrada, movendo-o para a
+    quarentena, e acrescenta uma linha ao manifesto com origem, destino e
+    erro. Membros de pacote não podem ser movidos sozinhos: o pacote é
+    copiado (uma vez) e continua na origem por causa dos membros válidos.
+    Devolve o caminho na quarentena.
+    """
+    os.makedirs(pasta_quarentena, exist_ok=True)
+    origem = nome.split(separador_pacote, 1)[0]
+    destino = os.path.join(pasta_quarentena, os.path.basename(origem))
+
+    if origem == nome:
+        if os.path.exists(destino):
+            base, extensao = os.path.splitext(destino)
+            destino = f"{base}_{time.time_ns()}{extensao}"
+        shutil.move(origem, destino)
+    elif not os.path.exists(destino):
+        shutil.copy2(origem, destino)
+
+    with open(os.path.join(pasta_quarentena, MANIFESTO_QUARENTENA), "a", encoding="utf-8") as manifesto:
+        manifesto.write(json.dumps({
+            "arquivo": nome,
+            "destino": destino,
+            "erro": erro,
+            "em": datetime.now().isoformat(timespec="seconds"),
+        }, ensure_ascii=False) + "\n")
+    return destino
+
+
+class ColetorMetricas:
+    """
+    Recebe as métricas de cada arquivo à medida que os lotes terminam.
+    Grava uma linha por arquivo no CSV (se informado), manda os arquivos
+    com erro para a quarentena (se informada) e guarda só os tempos e os
+    arquivos mais lentos para o resumo, sem crescer com os resultados.
+    """
+
+    def __init__(self, caminho_csv=None, pasta_quarentena=None, separador_pacote="::",
+                 mais_lentos=10):
+        self.pasta_quarentena = pasta_quarentena or None
+        self.separador_pacote = separador_pacote
+        self.mais_lentos = mais_lentos
+        self.inicio = time.perf_counter()
+
+        self.tempos = array("d")
+        self.arquivos = self.erros = self.itens = self.bytes = 0
+        self.em_quarentena = 0
+        self.xsd_validos = self.xsd_invalidos = 0
+        self._lentos = []
+
+        self._arquivo_csv = None
+        self._csv = None
+        if caminho_csv:
+            pasta = os.path.dirname(os.path.abspath(caminho_csv))
+            os.makedirs(pasta, exist_ok=True)
+            self._arquivo_csv = open(caminho_csv, "w", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._arquivo_csv)
+            self._csv.writerow(["arquivo", "segundos", "bytes", "itens", "xsd", "erro"])
+
+    def registrar(self, nome, metrica, erro=None):
+        """
+        Registra um arquivo: metrica é (segundos, bytes, itens, xsd), com
+        xsd True/False quando a nota passou pela validação XSD, ou None.
+        """
+        segundos, tamanho, itens, xsd = metrica
+        self.arquivos += 1
+        if xsd is not None:
+            if xsd:
+                self.xsd_validos += 1
+            else:
+                self.xsd_invalidos += 1
+        self.bytes += tamanho
+        self.itens += itens
+        self.tempos.append(segundos)
+
+        # Heap mínimo com os N mais lentos
+        entrada = (segundos, nome, itens, tamanho)
+        if len(self._lentos) < self.mais_lentos:
+            heapq.heappush(self._lentos, entrada)
+        elif segundos > self._lentos[0][0]:
+            heapq.heapreplace(self._lentos, entrada)
+
+        if self._csv is not None:
+            situacao_xsd = "" if xsd is None else ("valido" if xsd else "invalido")
+            self._csv.writerow([nome, f"{segundos:.6f}", tamanho, itens, situacao_xsd, erro or ""])
+
+        if erro is not None:
+            self.erros += 1
+            if self.pasta_quarentena:
+                try:
+                    mover_para_quarentena(nome, erro, self.pasta_quarentena, self.separador_pacote)
+                    self.em_quarentena += 1
+                except OSError as e:
+                    print(f"Não foi possível pôr em quarentena: {nome} -> {e}")
+
+    def resumo(self):
+        """
+        Devolve o resumo da execução: totais, vazão pelo tempo de relógio
+        e percentis do tempo de parse por arquivo (em ms). Com workers a
+        soma dos tempos por arquivo passa do tempo de relógio.
+        """
+        decorrido = time.perf_counter() - self.inicio
+        ordenados = sorted(self.tempos)
+        resumo = {
+            "arquivos": self.arquivos,
+            "erros": self.erros,
+            "em_quarentena": self.em_quarentena,
+            "xsd_validos": self.xsd_validos,
+            "xsd_invalidos": self.xsd_invalidos,
+            "itens": self.itens,
+            "mb": self.bytes / 1024 ** 2,
+            "segundos": decorrido,
+            "arquivos_s": self.arquivos / decorrido if decorrido else 0.0,
+            "itens_s": self.itens / decorrido if decorrido else 0.0,
+            "mb_s": self.bytes / 1024 ** 2 / decorrido if decorrido else 0.0,
+        }
+        for p in PERCENTIS:
+            resumo[f"p{p}_ms"] = percentil(ordenados, p) * 1000
+        resumo["max_ms"] = (ordenados[-1] if ordenados else 0.0) * 1000
+        resumo["mais_lentos"] = [
+            {"arquivo": nome, "ms": segundos * 1000, "itens": itens, "bytes": tamanho}
+            for segundos, nome, itens, tamanho in sorted(self._lentos, reverse=True)
+        ]
+        return resumo
+
+    def imprimir_resumo(self):
+        r = self.resumo()
+        print("\nResumo da execução:")
+        print(
+            f"  {r['arquivos']} arquivos ({r['erros']} com erro, {r['em_quarentena']} em quarentena) | "
+            f"{r['itens']} itens | {r['mb']:.1f} MB em {r['segundos']:.2f}s"
+        )
+        print(
+            f"  {r['arquivos_s']:,.1f} arquivos/s | {r['itens_s']:,.1f} itens/s | "
+            f"{r['mb_s']:,.2f} MB/s"
+        )
+        if r["xsd_validos"] or r["xsd_invalidos"]:
+            print(f"  XSD: {r['xsd_validos']} válidas | {r['xsd_invalidos']} rejeitadas")
+        print(
+            "  parse por arquivo: "
+            + " | ".join(f"p{p} {r[f'p{p}_ms']:.1f} ms" for p in PERCENTIS)
+            + f" | máx {r['max_ms']:.1f} ms"
+        )
+        if r["mais_lentos"]:
+            print("  Mais lentos:")
+            for lento in r["mais_lentos"]:
+                print(f"    {lento['ms']:9.1f} ms | {lento['itens']:6} itens | "
+                      f"{lento['bytes']:>10} bytes | {lento['arquivo']}")
+
+    def fechar(self):
+        if self._arquivo_csv is not None:
+            self._arquivo_csv.close()
+            self._arquivo_csv = self._csv = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
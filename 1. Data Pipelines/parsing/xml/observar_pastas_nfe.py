@@ -0,0 +1,307 @@
+"""
+Processo contínuo que observa as pastas de NF-e de processar_xml_nfe.py e
+acrescenta ao dataset Parquet cada XML (ou pacote ZIP/TAR) que chega, em
+microlotes, poucos segundos depois de a cópia terminar. Usa eventos do
+sistema de arquivos (watchdog: inotify no Linux) quando disponível e
+varredura periódica das pastas como alternativa. Um manifesto SQLite evita
+regravar arquivos já processados, inclusive depois de um reinício.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+# Para instalar as dependências necessárias, use o seguinte comando:
+# pip install pandas pyarrow watchdog   (watchdog é opcional)
+
+import os
+import queue
+import time
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog é opcional; sem ele as pastas são varridas
+    FileSystemEventHandler = object
+    Observer = None
+
+from gravar_parquet_nfe import DESTINO_PARQUET, gravar_parquet_particionado
+from manifesto_nfe import abrir_manifesto, filtrar_pendentes, registrar_processados
+from metricas_nfe import ColetorMetricas
+from processar_xml_nfe import (
+    COLUNAS,
+    METRICAS,
+    MODO_EXTRACAO,
+    PASTAS_XML,
+    QUARENTENA,
+    SEPARADOR_PACOTE,
+    TAMANHO_LOTE,
+    WORKERS,
+    e_arquivo_nfe,
+    listar_arquivos_nfe,
+)
+
+# Como perceber arquivos novos: "auto" (eventos se o watchdog estiver
+# instalado, senão varredura), "eventos" ou "varredura"
+MODO_OBSERVACAO = os.getenv("NFE_OBSERVAR_MODO", "auto")
+
+# Segundos sem mudança de tamanho e mtime para considerar a cópia concluída
+DEBOUNCE = float(os.getenv("NFE_OBSERVAR_DEBOUNCE", "2"))
+
+# Intervalo (s) entre varreduras das pastas. Com eventos a varredura só
+# cobre o que o sistema de arquivos deixou de avisar, então é mais espaçada.
+INTERVALO_VARREDURA = float(os.getenv("NFE_OBSERVAR_INTERVALO", "5"))
+INTERVALO_VARREDURA_EVENTOS = float(os.getenv("NFE_OBSERVAR_INTERVALO_EVENTOS", "60"))
+
+# Máximo de arquivos por microlote e pausa (s) entre verificações
+MAX_ARQUIVOS_MICROLOTE = int(os.getenv("NFE_OBSERVAR_LOTE_MAX", "500"))
+PAUSA = 0.5
+
+# Espera (s) antes de tentar de novo um microlote que falhou ao gravar,
+# dobrando a cada falha seguida até o máximo
+ESPERA_FALHA = float(os.getenv("NFE_OBSERVAR_ESPERA_FALHA", "5"))
+ESPERA_FALHA_MAX = float(os.getenv("NFE_OBSERVAR_ESPERA_FALHA_MAX", "300"))
+
+# Manifesto dos arquivos já gravados pelo observador
+MANIFESTO_OBSERVADOR = os.getenv("NFE_OBSERVAR_MANIFESTO", "./data/nfe_observador.db")
+
+
+class _EventosNFe(FileSystemEventHandler):
+    """
+    Coloca na fila os caminhos de NF-e criados, alterados ou movidos para
+    as pastas observadas. O tratamento fica no laço principal.
+    """
+
+    def __init__(self, fila):
+        super().__init__()
+        self.fila = fila
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        caminho = getattr(event, "dest_path", "") or event.src_path
+        if e_arquivo_nfe(caminho):
+            self.fila.put(caminho)
+
+
+def resolver_modo(preferencia):
+    """
+    Resolve o modo de observação. "auto" cai para a varredura quando o
+    watchdog não está instalado; "eventos" explícito sem o pacote é erro.
+    """
+    if preferencia not in ("auto", "eventos", "varredura"):
+        raise ValueError(f"Modo de observação inválido: {preferencia}")
+    if preferencia == "varredura":
+        return "varredura"
+    if Observer is None:
+        if preferencia == "eventos":
+            raise ImportError("NFE_OBSERVAR_MODO=eventos, mas o pacote watchdog não está instalado.")
+        return "varredura"
+    return "eventos"
+
+
+def _varrer(pastas, conhecidos, candidatos):
+    """
+    Acrescenta a `candidatos` os arquivos das pastas que são novos ou
+    mudaram de tamanho/mtime desde a última varredura.
+    """
+    for pasta in pastas:
+        for caminho in listar_arquivos_nfe(pasta):
+            try:
+                stat = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            assinatura = (stat.st_size, stat.st_mtime_ns)
+            if conhecidos.get(caminho) != assinatura:
+                conhecidos[caminho] = assinatura
+                candidatos.add(caminho)
+
+
+def _atualizar_pendentes(pendentes, candidatos, agora):
+    """
+    Debounce: guarda em `pendentes` ({caminho: (assinatura, desde)}) o
+    tamanho e mtime de cada arquivo e desde quando eles não mudam.
+    Arquivos apagados antes de estabilizar saem da lista.
+    """
+    for caminho in candidatos | set(pendentes):
+        try:
+            stat = os.stat(caminho)
+        except FileNotFoundError:
+            pendentes.pop(caminho, None)
+            continue
+        assinatura = (stat.st_size, stat.st_mtime_ns)
+        anterior = pendentes.get(caminho)
+        if anterior is None or anterior[0] != assinatura:
+            pendentes[caminho] = (assinatura, agora)
+
+
+def _retirar_estaveis(pendentes, agora):
+    """
+    Remove de `pendentes` e devolve, em ordem, até MAX_ARQUIVOS_MICROLOTE
+    arquivos sem mudança há pelo menos DEBOUNCE segundos.
+    """
+    estaveis = sorted(
+        caminho for caminho, (_, desde) in pendentes.items()
+        if agora - desde >= DEBOUNCE
+    )[:MAX_ARQUIVOS_MICROLOTE]
+    for caminho in estaveis:
+        del pendentes[caminho]
+    return estaveis
+
+
+def _devolver_pendentes(pendentes, caminhos, desde):
+    """
+    Recoloca em `pendentes` os arquivos de um microlote que não foi
+    gravado, como estáveis a partir de `desde`. Os que sumiram ficam de fora.
+    """
+    for caminho in caminhos:
+        try:
+            stat = os.stat(caminho)
+        except FileNotFoundError:
+            continue
+        pendentes[caminho] = ((stat.st_size, stat.st_mtime_ns), desde)
+
+
+def processar_microlote(conexao, caminhos, destino=DESTINO_PARQUET, modo=MODO_EXTRACAO,
+                        workers=1, tamanho_lote=64, colunas=None, metricas=None):
+    """
+    Grava no dataset Parquet os arquivos do microlote que ainda não constam
+    no manifesto e registra os que deram certo, lote a lote, logo depois
+    de cada lote ser publicado: se um lote seguinte falhar, os já gravados
+    não voltam na nova tentativa. Arquivos com erro (ou pacotes com algum
+    membro com erro) ficam fora do manifesto e voltam a ser tentados quando
+    mudarem ou no próximo início do observador; um pacote parcialmente
+    gravado pode então repetir notas, que a carga de destino deve
+    deduplicar por chave_acesso.
+    Devolve (arquivos_gravados, linhas_gravadas).
+    """
+    novos = {n["caminho"]: n for n in filtrar_pendentes(conexao, caminhos)}
+    if not novos:
+        return 0, 0
+
+    erros = []
+    gravados = []
+
+    def registrar_lote(caminhos_lote):
+        # Membros de pacote respondem pelo pacote ("pacote.zip::nota.xml")
+        com_erro = {nome.split(SEPARADOR_PACOTE, 1)[0] for nome, _ in erros}
+        lote = [novos[c] for c in caminhos_lote if c not in com_erro]
+        registrar_processados(conexao, lote)
+        gravados.extend(lote)
+
+    _, linhas = gravar_parquet_particionado(
+        list(novos),
+        destino,
+        modo=modo,
+        workers=workers,
+        tamanho_lote=tamanho_lote,
+        colunas=colunas,
+        erros=erros,
+        metricas=metricas,
+        ao_gravar=registrar_lote,
+    )
+    return len(gravados), linhas
+
+
+def observar(pastas=PASTAS_XML, destino=DESTINO_PARQUET, caminho_manifesto=MANIFESTO_OBSERVADOR,
+             modo_observacao=MODO_OBSERVACAO, modo=MODO_EXTRACAO, workers=1, tamanho_lote=64,
+             colunas=None):
+    """
+    Laço principal: junta os arquivos avisados por eventos ou achados na
+    varredura, espera cada um estabilizar (DEBOUNCE) e grava os estáveis
+    em microlotes. A primeira varredura pega o que chegou com o observador
+    parado. Um microlote que falha ao gravar volta inteiro para a fila e
+    é tentado de novo após NFE_OBSERVAR_ESPERA_FALHA segundos (dobrando a
+    cada falha seguida). Roda até ser interrompido (Ctrl+C); ao sair,
+    imprime o resumo das métricas. Com NFE_QUARENTENA os arquivos com erro
+    saem da pasta.
+    """
+    modo_observacao = resolver_modo(modo_observacao)
+    for pasta in pastas:
+        if not os.path.isdir(pasta):
+            print(f"⚠️ Pasta não encontrada, ignorada: {pasta}")
+    pastas = [p for p in pastas if os.path.isdir(p)]
+    if not pastas:
+        raise SystemExit("❌ Nenhuma pasta de NF-e para observar.")
+
+    fila = queue.Queue()
+    observador = None
+    intervalo = INTERVALO_VARREDURA
+    if modo_observacao == "eventos":
+        observador = Observer()
+        for pasta in pastas:
+            observador.schedule(_EventosNFe(fila), pasta, recursive=False)
+        observador.start()
+        intervalo = INTERVALO_VARREDURA_EVENTOS
+
+    conexao = abrir_manifesto(caminho_manifesto)
+    metricas = ColetorMetricas(METRICAS, QUARENTENA, SEPARADOR_PACOTE)
+    conhecidos, pendentes = {}, {}
+    proxima_varredura = 0.0
+    falhas_seguidas = 0
+    print(f"👀 Observando {len(pastas)} pasta(s) por {modo_observacao}. Ctrl+C para encerrar.")
+
+    try:
+        while True:
+            agora = time.monotonic()
+            candidatos = set()
+            while True:
+                try:
+                    candidatos.add(fila.get_nowait())
+                except queue.Empty:
+                    break
+            if agora >= proxima_varredura:
+                _varrer(pastas, conhecidos, candidatos)
+                proxima_varredura = agora + intervalo
+
+            _atualizar_pendentes(pendentes, candidatos, agora)
+            estaveis = _retirar_estaveis(pendentes, agora)
+            if not estaveis:
+                time.sleep(PAUSA)
+                continue
+
+            inicio = time.perf_counter()
+            try:
+                arquivos, linhas = processar_microlote(
+                    conexao, estaveis, destino, modo, workers, tamanho_lote, colunas, metricas
+                )
+            except Exception as e:
+                # Falha do destino (disco, permissão): o observador segue vivo e
+                # os arquivos voltam para os pendentes, já que nem a varredura
+                # nem os eventos os avisariam de novo sem mudança no arquivo
+                espera = min(ESPERA_FALHA * 2 ** falhas_seguidas, ESPERA_FALHA_MAX)
+                falhas_seguidas += 1
+                _devolver_pendentes(pendentes, estaveis, agora + espera)
+                print(
+                    f"❌ Erro ao gravar microlote de {len(estaveis)} arquivo(s): {e} "
+                    f"(nova tentativa em {espera:.1f}s)"
+                )
+                continue
+            falhas_seguidas = 0
+            if arquivos:
+                print(
+                    f"✅ {arquivos} arquivo(s), {linhas} linha(s) gravados em "
+                    f"{time.perf_counter() - inicio:.2f}s"
+                )
+    finally:
+        if observador is not None:
+            observador.stop()
+            observador.join()
+        conexao.close()
+        metricas.imprimir_resumo()
+        metricas.fechar()
+
+
+def main():
+    observar(
+        workers=WORKERS,
+        tamanho_lote=TAMANHO_LOTE,
+        colunas=COLUNAS,
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("🛑 Observador interrompido pelo usuário.")
@@ -1,6 +1,7 @@
 """
 Extrai itens e impostos de XMLs de NF-e para um DataFrame unificado.
-Percorre pastas específicas, concatena resultados e exibe um resumo final.
+Percorre pastas (e pacotes ZIP/TAR), concatena resultados e exibe um
+resumo final. A configuração vem de variáveis de ambiente NFE_*.
 
 Author: Gustavo F. Lima
 License: MIT
@@ -9,136 +10,1305 @@ Created: 2025
 
 import os
 import glob
+import tarfile
+import time
+import zipfile
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from collections import deque
 import pandas as pd
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # lxml é opcional; sem ele fica o xml.etree da stdlib
+    lxml_etree = None
 
-def extrair_dados_xml_pandas(caminho_arquivo):
+from manifesto_nfe import (
+    abrir_manifesto,
+    chaves_processadas,
+    filtrar_pendentes,
+    registrar_processados,
+)
+from metricas_nfe import ColetorMetricas
+
+
+NS_NFE = 'http://www.portalfiscal.inf.br/nfe'
+
+# Pastas com os XMLs (e pacotes ZIP/TAR) de NF-e
+PASTAS_XML = [
+    r"C:\Users\nome_usuario\Teste\pasta_xml_1",
+    r"C:\Users\nome_usuario\Teste\pasta_xml_2",
+]
+
+# Modo de extração usado pelo main(): "dom" (parse, documento inteiro
+# em memória) ou "streaming" (iterparse, memória constante por item).
+MODO_EXTRACAO = os.getenv("NFE_MODO_EXTRACAO", "dom")
+
+# Backend XML: "auto" (lxml no dom, se instalado; stdlib no streaming,
+# onde o iterparse do lxml é mais lento), "lxml" ou "stdlib"
+BACKEND_XML = os.getenv("NFE_BACKEND_XML", "auto")
+
+# Motor de extração dos campos do item: "passagem_unica" (percorre o det
+# uma vez) ou "findtext" (uma busca XPath por coluna, mais lento).
+MOTOR_ITENS = os.getenv("NFE_MOTOR_ITENS", "passagem_unica")
+
+# Processos usados na extração (1 = serial) e arquivos enviados por tarefa.
+WORKERS = int(os.getenv("NFE_WORKERS", "1"))
+TAMANHO_LOTE = int(os.getenv("NFE_TAMANHO_LOTE", "64"))
+
+# Linhas por bloco entregue às cargas por iterar_blocos
+TAMANHO_BLOCO = int(os.getenv("NFE_TAMANHO_BLOCO", "50000"))
+
+# Colunas de saída separadas por vírgula (vazio = todas)
+COLUNAS = [c.strip() for c in os.getenv("NFE_COLUNAS", "").split(",") if c.strip()] or None
+
+# Formato de saída: "itens" (uma tabela, cabeçalho repetido em cada item),
+# "normalizada" (tabelas de notas e de itens ligadas por chave_acesso) ou
+# "agregada" (totais de impostos por grupo, sem materializar os itens).
+SAIDA = os.getenv("NFE_SAIDA", "itens")
+
+# Dimensões e valores somados na saída "agregada". "ano_mes" vem do dhEmi;
+# as demais dimensões podem ser quaisquer colunas de COLUNAS_DISPONIVEIS.
+AGREGAR_POR = [
+    c.strip() for c in os.getenv("NFE_AGREGAR_POR", "CFOP,NCM,UF_emit,ano_mes").split(",")
+    if c.strip()
+]
+VALORES_AGREGADOS = [
+    c.strip() for c in os.getenv(
+        "NFE_VALORES_AGREGADOS",
+        "vProd,ICMS_vBC,ICMS_vICMS,vBCST,vICMSST,vICMSSTRet,IPI_vIPI,PIS_vPIS,COFINS_vCOFINS",
+    ).split(",")
+    if c.strip()
+]
+
+# Converte valores, datas e códigos para tipos próprios (ver TIPOS_COLUNAS)
+TIPADO = os.getenv("NFE_TIPADO", "0") == "1"
+
+# Banco SQLite do modo incremental (vazio = reprocessa tudo). Vale para a
+# saída "itens"; só arquivos novos ou alterados são extraídos.
+MANIFESTO = os.getenv("NFE_MANIFESTO", "")
+
+# CSV com tempo, bytes e itens de cada arquivo (vazio = só o resumo) e
+# pasta para onde vão os XMLs com erro (vazio = ficam onde estão)
+METRICAS = os.getenv("NFE_METRICAS", "")
+QUARENTENA = os.getenv("NFE_QUARENTENA", "")
+
+# XSD oficial da NF-e (nfe_v4.00.xsd do pacote de schemas da SEFAZ, com os
+# arquivos que ele importa na mesma pasta). Vazio = sem validação. Exige o
+# lxml e o modo dom; notas fora do schema viram erro e não são carregadas.
+XSD = os.getenv("NFE_XSD", "")
+
+# Pacotes lidos direto, sem extrair em disco. Os membros aparecem nos
+# resultados como "pacote.zip::pasta/nota.xml".
+EXTENSOES_PACOTE_ZIP = (".zip",)
+EXTENSOES_PACOTE_TAR = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+SEPARADOR_PACOTE = "::"
+
+NS = {'ns': NS_NFE}
+TAG_NFE = f'{{{NS_NFE}}}NFe'
+TAG_INFNFE = f'{{{NS_NFE}}}infNFe'
+TAG_DET = f'{{{NS_NFE}}}det'
+TAG_PROD = f'{{{NS_NFE}}}prod'
+TAG_IMPOSTO = f'{{{NS_NFE}}}imposto'
+
+
+# Especificação declarativa das colunas como (coluna, grupo, caminho).
+# Caminhos iniciados por "@" são atributos do próprio grupo. No cabeçalho o
+# grupo é um filho direto de infNFe; no item, "prod" é lido só nos filhos
+# diretos e nos grupos de imposto a tag é procurada em qualquer
+# profundidade, como no caminho './/ns:ICMS//ns:CST'.
+CAMPOS_CABECALHO = [
+    ("chave_acesso", "infNFe", "@Id"),
+    ("dhEmi", "ide", "dhEmi"),
+    ("natOp", "ide", "natOp"),
+    ("mod", "ide", "mod"),
+    ("serie", "ide", "serie"),
+    ("nNF", "ide", "nNF"),
+    ("vNF", "total", "ICMSTot/vNF"),
+
+    ("CNPJ_emit", "emit", "CNPJ"),
+    ("xNome_emit", "emit", "xNome"),
+    ("UF_emit", "emit", "enderEmit/UF"),
+    ("cMun_emit", "emit", "enderEmit/cMun"),
+
+    ("CNPJ_dest", "dest", "CNPJ"),
+    ("xNome_dest", "dest", "xNome"),
+    ("UF_dest", "dest", "enderDest/UF"),
+    ("cMun_dest", "dest", "enderDest/cMun"),
+]
+
+# Grupos que podem faltar na nota: sem o elemento, as colunas não aparecem
+GRUPOS_OPCIONAIS = ("emit", "dest")
+
+CAMPOS_ITEM = [
+    ("nItem", "det", "@nItem"),
+    ("cProd", "prod", "cProd"),
+    ("cEAN", "prod", "cEAN"),
+    ("xProd", "prod", "xProd"),
+    ("NCM", "prod", "NCM"),
+    ("CEST", "prod", "CEST"),
+    ("cBenef", "prod", "cBenef"),
+    ("CFOP", "prod", "CFOP"),
+    ("uCom", "prod", "uCom"),
+    ("qCom", "prod", "qCom"),
+    ("vUnCom", "prod", "vUnCom"),
+    ("vProd", "prod", "vProd"),
+
+    ("ICMS_CST", "ICMS", "CST"),
+    ("ICMS_vBC", "ICMS", "vBC"),
+    ("ICMS_pICMS", "ICMS", "pICMS"),
+    ("ICMS_vICMS", "ICMS", "vICMS"),
+
+    ("vBCSTRet", "ICMS", "vBCSTRet"),
+    ("pST", "ICMS", "pST"),
+    ("vICMSSubstituto", "ICMS", "vICMSSubstituto"),
+    ("vICMSSTRet", "ICMS", "vICMSSTRet"),
+
+    ("pRedBCEfet", "ICMS", "pRedBCEfet"),
+    ("vBCEfet", "ICMS", "vBCEfet"),
+    ("pICMSEfet", "ICMS", "pICMSEfet"),
+    ("vICMSEfet", "ICMS", "vICMSEfet"),
+
+    ("IPI_CST", "IPI", "CST"),
+    ("IPI_vBC", "IPI", "vBC"),
+    ("IPI_pIPI", "IPI", "pIPI"),
+    ("IPI_vIPI", "IPI", "vIPI"),
+
+    ("PIS_CST", "PIS", "CST"),
+    ("PIS_vBC", "PIS", "vBC"),
+    ("PIS_vPIS", "PIS", "vPIS"),
+
+    ("COFINS_vBC", "COFINS", "vBC"),
+    ("COFINS_pCOFINS", "COFINS", "pCOFINS"),
+    ("COFINS_vCOFINS", "COFINS", "vCOFINS"),
+]
+
+# ICMS-ST próprio (ICMS10/30/70/90). Só entra quando pedido explicitamente,
+# para não mudar as colunas da saída padrão.
+CAMPOS_ITEM_ADICIONAIS = [
+    ("vBCST", "ICMS", "vBCST"),
+    ("pICMSST", "ICMS", "pICMSST"),
+    ("vICMSST", "ICMS", "vICMSST"),
+]
+
+# Tipos aplicados na saída tipada. Colunas fora deste mapa continuam texto
+# (CNPJ, cEAN e cProd, por exemplo, têm zeros à esquerda significativos).
+TIPOS_COLUNAS = {
+    "dhEmi": "data",
+    "natOp": "categoria",
+    "mod": "categoria",
+    "serie": "categoria",
+    "nNF": "inteiro",
+    "vNF": "numero",
+    "UF_emit": "categoria",
+    "cMun_emit": "categoria",
+    "UF_dest": "categoria",
+    "cMun_dest": "categoria",
+
+    "nItem": "inteiro",
+    "NCM": "categoria",
+    "CEST": "categoria",
+    "cBenef": "categoria",
+    "CFOP": "categoria",
+    "uCom": "categoria",
+    "qCom": "numero",
+    "vUnCom": "numero",
+    "vProd": "numero",
+
+    "ICMS_CST": "categoria",
+    "ICMS_vBC": "numero",
+    "ICMS_pICMS": "numero",
+    "ICMS_vICMS": "numero",
+    "vBCSTRet": "numero",
+    "pST": "numero",
+    "vICMSSubstituto": "numero",
+    "vICMSSTRet": "numero",
+    "pRedBCEfet": "numero",
+    "vBCEfet": "numero",
+    "pICMSEfet": "numero",
+    "vICMSEfet": "numero",
+
+    "IPI_CST": "categoria",
+    "IPI_vBC": "numero",
+    "IPI_pIPI": "numero",
+    "IPI_vIPI": "numero",
+
+    "PIS_CST": "categoria",
+    "PIS_vBC": "numero",
+    "PIS_vPIS": "numero",
+
+    "COFINS_vBC": "numero",
+    "COFINS_pCOFINS": "numero",
+    "COFINS_vCOFINS": "numero",
+
+    "vBCST": "numero",
+    "pICMSST": "numero",
+    "vICMSST": "numero",
+}
+
+COLUNAS_DISPONIVEIS = [c for c, _, _ in CAMPOS_CABECALHO + CAMPOS_ITEM + CAMPOS_ITEM_ADICIONAIS]
+
+
+def _tag(nome):
+    return f'{{{NS_NFE}}}{nome}'
+
+
+@lru_cache(maxsize=None)
+def _compilar_plano(colunas):
     """
-    Extrai dados de um XML de NF-e e retorna um DataFrame Pandas
-    (uma linha por item da nota).
+    Compila a especificação (filtrada por `colunas`, ou completa se None)
+    num plano de extração com as tags já no formato '{namespace}nome'.
+    Grupos sem nenhuma coluna pedida ficam fora do plano e não são lidos.
+    """
+    def selecionada(coluna):
+        return colunas is None or coluna in colunas
+
+    campos_cabecalho = [c for c in CAMPOS_CABECALHO if selecionada(c[0])]
+    campos_item = [c for c in CAMPOS_ITEM if selecionada(c[0])]
+    if colunas is not None:
+        campos_item += [c for c in CAMPOS_ITEM_ADICIONAIS if c[0] in colunas]
+
+    # Cabeçalho: {tag_grupo: [(coluna, caminho_findtext, xpath_lxml)]}
+    atributo_chave = None
+    colunas_fixas = []
+    grupos_cabecalho = {}
+    for coluna, grupo, caminho in campos_cabecalho:
+        if grupo == "infNFe":
+            atributo_chave = coluna
+            colunas_fixas.append(coluna)
+            continue
+        if grupo not in GRUPOS_OPCIONAIS:
+            colunas_fixas.append(coluna)
+        caminho_ns = '/'.join(f'ns:{parte}' for parte in caminho.split('/'))
+        xpath = None
+        if lxml_etree is not None:
+            # smart_strings=False evita que o texto devolvido prenda a árvore
+            xpath = lxml_etree.XPath(f'string({caminho_ns})', namespaces=NS, smart_strings=False)
+        grupos_cabecalho.setdefault(_tag(grupo), []).append((coluna, caminho_ns, xpath))
+
+    # Item: {tag: coluna} para prod e {tag_grupo: {tag: coluna}} para
+    # impostos; o motor findtext usa [(coluna, atributo, caminho_findtext)]
+    atributo_item = None
+    mapa_prod = {}
+    mapa_impostos = {}
+    campos_findtext = []
+    for coluna, grupo, tag in campos_item:
+        if grupo == "det":
+            atributo_item = coluna
+            campos_findtext.append((coluna, tag[1:], None))
+        elif grupo == "prod":
+            mapa_prod[_tag(tag)] = coluna
+            campos_findtext.append((coluna, None, f'ns:prod/ns:{tag}'))
+        else:
+            mapa_impostos.setdefault(_tag(grupo), {})[_tag(tag)] = coluna
+            campos_findtext.append((coluna, None, f'.//ns:{grupo}//ns:{tag}'))
+
+    return {
+        "colunas": [c for c, _, _ in campos_cabecalho + campos_item],
+        "atributo_chave": atributo_chave,
+        "colunas_fixas": colunas_fixas,
+        "grupos_cabecalho": grupos_cabecalho,
+        "item": (
+            [c for c, _, _ in campos_item],
+            atributo_item,
+            mapa_prod,
+            mapa_impostos,
+        ),
+        "item_findtext": campos_findtext,
+    }
+
+
+def compilar_plano(colunas=None):
+    """
+    Valida as colunas pedidas e devolve o plano de extração compilado.
+    O plano é criado uma vez por processo para cada seleção de colunas;
+    as colunas saem sempre na ordem da especificação.
+    """
+    if colunas is not None:
+        desconhecidas = set(colunas) - set(COLUNAS_DISPONIVEIS)
+        if desconhecidas:
+            raise ValueError(
+                f"Colunas desconhecidas: {sorted(desconhecidas)}. "
+                f"Disponíveis: {COLUNAS_DISPONIVEIS}"
+            )
+        colunas = frozenset(colunas)
+    return _compilar_plano(colunas)
+
+
+def _iniciar_cabecalho(infNFe, plano):
+    """
+    Cria o dict do cabeçalho com a chave de acesso e as colunas fixas
+    vazias, na ordem da saída.
+    """
+    cabecalho = dict.fromkeys(plano["colunas_fixas"], '')
+    if plano["atributo_chave"] is not None:
+        cabecalho[plano["atributo_chave"]] = infNFe.attrib.get('Id', '').replace('NFe', '')
+    return cabecalho
+
+
+def _extrair_grupo_cabecalho(grupo, campos, cabecalho, backend):
+    """
+    Preenche no cabeçalho as colunas de um grupo (ide, emit, dest, total),
+    com XPath pré-compilado no lxml ou findtext na stdlib.
+    """
+    if backend == "lxml":
+        for coluna, _, xpath in campos:
+            cabecalho[coluna] = xpath(grupo)
+        return
+
+    for coluna, caminho, _ in campos:
+        cabecalho[coluna] = grupo.findtext(caminho, default='', namespaces=NS)
+
+
+def _extrair_item_findtext(det, campos_findtext):
+    """
+    Extrai os campos do item previstos no plano com uma chamada findtext
+    por coluna (motor de referência), nos caminhos gerados a partir de
+    CAMPOS_ITEM pelo compilador do plano.
     """
-    tree = ET.parse(caminho_arquivo)
+    return {
+        coluna: det.attrib.get(atributo, '') if atributo is not None
+        else det.findtext(caminho, default='', namespaces=NS)
+        for coluna, atributo, caminho in campos_findtext
+    }
+
+
+def _extrair_item_passagem_unica(det, plano_item):
+    """
+    Extrai os campos do item previstos no plano percorrendo a subárvore do
+    det uma única vez. Como no findtext, vale a primeira ocorrência de
+    cada tag dentro do grupo; grupos fora do plano nem são visitados.
+    """
+    colunas, atributo_item, mapa_prod, mapa_impostos = plano_item
+    valores = dict.fromkeys(colunas)
+    if atributo_item is not None:
+        valores[atributo_item] = det.attrib.get('nItem', '')
+
+    for filho in det:
+        if filho.tag == TAG_PROD:
+            if not mapa_prod:
+                continue
+            for campo in filho:
+                coluna = mapa_prod.get(campo.tag)
+                if coluna is not None and valores[coluna] is None:
+                    valores[coluna] = campo.text or ''
+        elif filho.tag == TAG_IMPOSTO:
+            for grupo in filho:
+                mapa = mapa_impostos.get(grupo.tag)
+                if mapa is None:
+                    continue
+                for campo in grupo.iter():
+                    coluna = mapa.get(campo.tag)
+                    if coluna is not None and valores[coluna] is None:
+                        valores[coluna] = campo.text or ''
+
+    for coluna, valor in valores.items():
+        if valor is None:
+            valores[coluna] = ''
+    return valores
+
+
+def _extrair_item(det, plano):
+    """
+    Extrai os campos de produto e impostos de um elemento det usando o
+    motor configurado em MOTOR_ITENS.
+    """
+    if MOTOR_ITENS == "findtext":
+        return _extrair_item_findtext(det, plano["item_findtext"])
+    return _extrair_item_passagem_unica(det, plano["item"])
+
+
+def resolver_backend(preferencia, modo="dom"):
+    """
+    Resolve a preferência de backend XML para o modo de extração. "auto"
+    usa o lxml só no dom e cai para a stdlib quando o lxml não está
+    instalado; "lxml" explícito sem o pacote é erro.
+    """
+    if preferencia not in ("auto", "lxml", "stdlib"):
+        raise ValueError(f"Backend XML inválido: {preferencia}")
+    if preferencia == "stdlib" or (preferencia == "auto" and modo == "streaming"):
+        return "stdlib"
+    if lxml_etree is None:
+        if preferencia == "lxml":
+            raise ImportError("NFE_BACKEND_XML=lxml, mas o pacote lxml não está instalado.")
+        return "stdlib"
+    return "lxml"
+
+
+# Backends efetivos deste processo, do dom e do streaming (os workers
+# resolvem os mesmos pela env var)
+BACKEND = resolver_backend(BACKEND_XML, "dom")
+BACKEND_STREAMING = resolver_backend(BACKEND_XML, "streaming")
+
+if XSD and BACKEND != "lxml":
+    raise ImportError("NFE_XSD exige o backend lxml (instale o lxml e use NFE_BACKEND_XML=auto ou lxml).")
+if XSD and MODO_EXTRACAO != "dom":
+    raise ValueError("NFE_XSD exige NFE_MODO_EXTRACAO=dom: a validação usa a árvore completa.")
+
+
+class ErroValidacaoXSD(ValueError):
+    """
+    NF-e fora do schema oficial configurado em NFE_XSD.
+    """
+
+
+@lru_cache(maxsize=None)
+def _esquema_xsd(caminho_xsd):
+    """
+    Compila o XSD uma única vez por processo: cada worker do pool monta o
+    seu na primeira nota e reaproveita nas seguintes.
+    """
+    return lxml_etree.XMLSchema(lxml_etree.parse(caminho_xsd))
+
+
+def validar_xsd(root, caminho_xsd=None):
+    """
+    Valida o elemento NFe (raiz do documento ou dentro de nfeProc) contra
+    o XSD, reaproveitando a árvore já lida pela extração. Levanta
+    ErroValidacaoXSD com as primeiras violações encontradas.
+    """
+    nfe = root if root.tag == TAG_NFE else root.find(TAG_NFE)
+    if nfe is None:
+        raise ErroValidacaoXSD("elemento NFe não encontrado")
+
+    esquema = _esquema_xsd(caminho_xsd or XSD)
+    if not esquema.validate(nfe):
+        violacoes = list(esquema.error_log)[:3]
+        raise ErroValidacaoXSD("; ".join(f"linha {v.line}: {v.message}" for v in violacoes))
+
+
+def _modulo_xml(backend):
+    """
+    Devolve o módulo com parse/iterparse do backend indicado.
+    """
+    return lxml_etree if backend == "lxml" else ET
+
+
+def _abrir_xml(origem):
+    """
+    Abre a origem para leitura binária: caminho no disco ou um arquivo já
+    aberto (membro de pacote), que é usado como está.
+    """
+    if hasattr(origem, "read"):
+        return nullcontext(origem)
+    return open(origem, 'rb')
+
+
+def e_arquivo_nfe(caminho):
+    """
+    Indica se o caminho tem extensão de XML ou de pacote ZIP/TAR.
+    """
+    extensoes = (".xml",) + EXTENSOES_PACOTE_ZIP + EXTENSOES_PACOTE_TAR
+    return caminho.lower().endswith(extensoes)
+
+
+def listar_arquivos_nfe(pasta):
+    """
+    Lista os XMLs e os pacotes ZIP/TAR de uma pasta.
+    """
+    return sorted(
+        caminho for caminho in glob.glob(os.path.join(pasta, "*"))
+        if e_arquivo_nfe(caminho) and os.path.isfile(caminho)
+    )
+
+
+def iterar_xmls(caminho):
+    """
+    Gera (nome, arquivo, bytes) para cada XML do caminho: o próprio arquivo
+    ou cada membro .xml de um pacote ZIP/TAR, descompactado em streaming
+    direto para o extrator. TAR é lido sequencialmente (modo 'r|*'), então
+    funciona também com .tar.gz sem acesso aleatório. bytes é o tamanho
+    descompactado do XML.
+    """
+    nome = caminho.lower()
+    if nome.endswith(EXTENSOES_PACOTE_ZIP):
+        with zipfile.ZipFile(caminho) as pacote:
+            for info in pacote.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(".xml"):
+                    continue
+                with pacote.open(info) as membro:
+                    yield f"{caminho}{SEPARADOR_PACOTE}{info.filename}", membro, info.file_size
+    elif nome.endswith(EXTENSOES_PACOTE_TAR):
+        with tarfile.open(caminho, mode="r|*") as pacote:
+            for info in pacote:
+                if not info.isfile() or not info.name.lower().endswith(".xml"):
+                    continue
+                yield f"{caminho}{SEPARADOR_PACOTE}{info.name}", pacote.extractfile(info), info.size
+    else:
+        yield caminho, caminho, os.path.getsize(caminho)
+
+
+def extrair_nota_xml(caminho_arquivo, colunas=None):
+    """
+    Extrai um XML de NF-e separando cabeçalho e itens: devolve
+    (cabecalho, itens), com cabecalho None quando não há infNFe.
+    Os itens não repetem os campos do cabeçalho.
+    """
+    plano = compilar_plano(colunas)
+    with _abrir_xml(caminho_arquivo) as arquivo:
+        tree = _modulo_xml(BACKEND).parse(arquivo)
     root = tree.getroot()
-    ns = {'ns': 'http://www.portalfiscal.inf.br/nfe'}
+    if XSD:
+        validar_xsd(root)
 
-    infNFe = root.find('.//ns:infNFe', ns)
+    infNFe = root.find('.//ns:infNFe', NS)
     if infNFe is None:
-        return pd.DataFrame()
-
-    base_data = {
-        "chave_acesso": infNFe.attrib.get('Id', '').replace('NFe', ''),
-        "dhEmi": infNFe.findtext('.//ns:dhEmi', default='', namespaces=ns),
-        "natOp": infNFe.findtext('.//ns:natOp', default='', namespaces=ns),
-        "mod": infNFe.findtext('.//ns:mod', default='', namespaces=ns),
-        "serie": infNFe.findtext('.//ns:serie', default='', namespaces=ns),
-        "nNF": infNFe.findtext('.//ns:nNF', default='', namespaces=ns),
-        "vNF": infNFe.findtext('.//ns:vNF', default='', namespaces=ns),
-    }
+        return None, []
+
+    cabecalho = _iniciar_cabecalho(infNFe, plano)
+    for tag_grupo, campos in plano["grupos_cabecalho"].items():
+        grupo = infNFe.find(tag_grupo)
+        if grupo is not None:
+            _extrair_grupo_cabecalho(grupo, campos, cabecalho, BACKEND)
+
+    itens = [_extrair_item(det, plano) for det in infNFe.iterfind(TAG_DET)]
+    return cabecalho, itens
+
 
-    emit = infNFe.find('.//ns:emit', ns)
-    if emit is not None:
-        base_data.update({
-            "CNPJ_emit": emit.findtext('ns:CNPJ', default='', namespaces=ns),
-            "xNome_emit": emit.findtext('ns:xNome', default='', namespaces=ns),
-            "UF_emit": emit.findtext('ns:enderEmit/ns:UF', default='', namespaces=ns),
-            "cMun_emit": emit.findtext('ns:enderEmit/ns:cMun', default='', namespaces=ns),
-        })
-
-    dest = infNFe.find('.//ns:dest', ns)
-    if dest is not None:
-        base_data.update({
-            "CNPJ_dest": dest.findtext('ns:CNPJ', default='', namespaces=ns),
-            "xNome_dest": dest.findtext('ns:xNome', default='', namespaces=ns),
-            "UF_dest": dest.findtext('ns:enderDest/ns:UF', default='', namespaces=ns),
-            "cMun_dest": dest.findtext('ns:enderDest/ns:cMun', default='', namespaces=ns),
-        })
+def extrair_linhas_xml(caminho_arquivo, colunas=None):
+    """
+    Extrai dados de um XML de NF-e como lista de dicts
+    (uma linha por item da nota), apenas com as colunas pedidas.
+    """
+    base_data, itens = extrair_nota_xml(caminho_arquivo, colunas)
+    if base_data is None:
+        return []
 
     det_list = []
-    for det in infNFe.findall('ns:det', ns):
+    for item in itens:
         item_data = base_data.copy()
-        item_data.update({
-            "nItem": det.attrib.get('nItem', ''),
-            "cProd": det.findtext('ns:prod/ns:cProd', default='', namespaces=ns),
-            "cEAN": det.findtext('ns:prod/ns:cEAN', default='', namespaces=ns),
-            "xProd": det.findtext('ns:prod/ns:xProd', default='', namespaces=ns),
-            "NCM": det.findtext('ns:prod/ns:NCM', default='', namespaces=ns),
-            "CEST": det.findtext('ns:prod/ns:CEST', default='', namespaces=ns),
-            "cBenef": det.findtext('ns:prod/ns:cBenef', default='', namespaces=ns),
-            "CFOP": det.findtext('ns:prod/ns:CFOP', default='', namespaces=ns),
-            "uCom": det.findtext('ns:prod/ns:uCom', default='', namespaces=ns),
-            "qCom": det.findtext('ns:prod/ns:qCom', default='', namespaces=ns),
-            "vUnCom": det.findtext('ns:prod/ns:vUnCom', default='', namespaces=ns),
-            "vProd": det.findtext('ns:prod/ns:vProd', default='', namespaces=ns),
-
-            "ICMS_CST": det.findtext('.//ns:ICMS//ns:CST', default='', namespaces=ns),
-            "ICMS_vBC": det.findtext('.//ns:ICMS//ns:vBC', default='', namespaces=ns),
-            "ICMS_pICMS": det.findtext('.//ns:ICMS//ns:pICMS', default='', namespaces=ns),
-            "ICMS_vICMS": det.findtext('.//ns:ICMS//ns:vICMS', default='', namespaces=ns),
-
-            "vBCSTRet": det.findtext('.//ns:ICMS//ns:vBCSTRet', default='', namespaces=ns),
-            "pST": det.findtext('.//ns:ICMS//ns:pST', default='', namespaces=ns),
-            "vICMSSubstituto": det.findtext('.//ns:ICMS//ns:vICMSSubstituto', default='', namespaces=ns),
-            "vICMSSTRet": det.findtext('.//ns:ICMS//ns:vICMSSTRet', default='', namespaces=ns),
-
-            "pRedBCEfet": det.findtext('.//ns:ICMS//ns:pRedBCEfet', default='', namespaces=ns),
-            "vBCEfet": det.findtext('.//ns:ICMS//ns:vBCEfet', default='', namespaces=ns),
-            "pICMSEfet": det.findtext('.//ns:ICMS//ns:pICMSEfet', default='', namespaces=ns),
-            "vICMSEfet": det.findtext('.//ns:ICMS//ns:vICMSEfet', default='', namespaces=ns),
-
-            "IPI_CST": det.findtext('.//ns:IPI//ns:CST', default='', namespaces=ns),
-            "IPI_vBC": det.findtext('.//ns:IPI//ns:vBC', default='', namespaces=ns),
-            "IPI_pIPI": det.findtext('.//ns:IPI//ns:pIPI', default='', namespaces=ns),
-            "IPI_vIPI": det.findtext('.//ns:IPI//ns:vIPI', default='', namespaces=ns),
-
-            "PIS_CST": det.findtext('.//ns:PIS//ns:CST', default='', namespaces=ns),
-            "PIS_vBC": det.findtext('.//ns:PIS//ns:vBC', default='', namespaces=ns),
-            "PIS_vPIS": det.findtext('.//ns:PIS//ns:vPIS', default='', namespaces=ns),
-
-            "COFINS_vBC": det.findtext('.//ns:COFINS//ns:vBC', default='', namespaces=ns),
-            "COFINS_pCOFINS": det.findtext('.//ns:COFINS//ns:pCOFINS', default='', namespaces=ns),
-            "COFINS_vCOFINS": det.findtext('.//ns:COFINS//ns:vCOFINS', default='', namespaces=ns),
-        })
+        item_data.update(item)
         det_list.append(item_data)
 
-    return pd.DataFrame(det_list)
+    return det_list
 
 
-def main():
-    pastas = [
-        r"C:\Users\nome_usuario\Teste\pasta_xml_1",
-        r"C:\Users\nome_usuario\Teste\pasta_xml_2",
+def extrair_dados_xml_pandas(caminho_arquivo, colunas=None):
+    """
+    Extrai dados de um XML de NF-e e retorna um DataFrame Pandas
+    (uma linha por item da nota).
+    """
+    return pd.DataFrame(extrair_linhas_xml(caminho_arquivo, colunas))
+
+
+def iterar_itens_xml(caminho_arquivo, cabecalho=None, colunas=None):
+    """
+    Percorre o XML com iterparse e gera um dict por item (det) assim que o
+    elemento fecha. Cada filho de infNFe é descartado depois de lido, então
+    a memória fica estável independente da quantidade de itens da nota.
+
+    Os campos de cabeçalho são gravados no dict `cabecalho`, quando
+    informado. Como o grupo total vem depois dos itens no leiaute da NF-e,
+    o vNF só é preenchido ao final da iteração.
+    """
+    if XSD:
+        raise ValueError("A validação XSD (NFE_XSD) não está disponível no modo streaming.")
+    plano = compilar_plano(colunas)
+    grupos_cabecalho = plano["grupos_cabecalho"]
+
+    if cabecalho is None:
+        cabecalho = {}
+
+    infNFe = None
+    profundidade = 0
+    nivel_filho = None
+
+    with _abrir_xml(caminho_arquivo) as arquivo:
+        for evento, elem in _modulo_xml(BACKEND_STREAMING).iterparse(arquivo, events=('start', 'end')):
+            if evento == 'start':
+                profundidade += 1
+                if infNFe is None and elem.tag == TAG_INFNFE:
+                    infNFe = elem
+                    nivel_filho = profundidade + 1
+                    cabecalho.update(_iniciar_cabecalho(elem, plano))
+                continue
+
+            if infNFe is None:
+                profundidade -= 1
+                continue
+
+            if elem is infNFe:
+                break
+
+            if profundidade == nivel_filho:
+                tag = elem.tag
+                if tag == TAG_DET:
+                    yield _extrair_item(elem, plano)
+                elif tag in grupos_cabecalho:
+                    _extrair_grupo_cabecalho(elem, grupos_cabecalho[tag], cabecalho, BACKEND_STREAMING)
+
+                # Libera o filho já processado (e a referência no pai)
+                elem.clear()
+                infNFe.remove(elem)
+
+            profundidade -= 1
+
+
+def extrair_linhas_xml_streaming(caminho_arquivo, colunas=None):
+    """
+    Versão em streaming de extrair_linhas_xml: mesmas linhas de saída,
+    mas sem carregar a árvore inteira do XML em memória.
+    """
+    cabecalho = {}
+    itens = list(iterar_itens_xml(caminho_arquivo, cabecalho, colunas))
+    return [{**cabecalho, **item} for item in itens]
+
+
+def extrair_dados_xml_streaming(caminho_arquivo, colunas=None):
+    """
+    Versão em streaming de extrair_dados_xml_pandas.
+    """
+    return pd.DataFrame(extrair_linhas_xml_streaming(caminho_arquivo, colunas))
+
+
+def extrair_nota_xml_streaming(caminho_arquivo, colunas=None):
+    """
+    Versão em streaming de extrair_nota_xml.
+    """
+    cabecalho = {}
+    itens = list(iterar_itens_xml(caminho_arquivo, cabecalho, colunas))
+    return (cabecalho or None), itens
+
+
+EXTRATORES = {
+    "dom": extrair_linhas_xml,
+    "streaming": extrair_linhas_xml_streaming,
+}
+
+EXTRATORES_NOTA = {
+    "dom": extrair_nota_xml,
+    "streaming": extrair_nota_xml_streaming,
+}
+
+
+def validar_modo(modo):
+    """
+    Recusa, antes de ler qualquer arquivo, um modo de extração
+    desconhecido ou o streaming com NFE_XSD (a validação precisa da árvore
+    completa), em vez de rejeitar nota por nota dentro dos workers.
+    """
+    if modo not in EXTRATORES:
+        raise ValueError(f"Modo de extração inválido: {modo}")
+    if XSD and modo != "dom":
+        raise ValueError("NFE_XSD exige o modo dom: a validação usa a árvore completa.")
+
+
+def _processar_xmls(caminhos, processar, contar_itens):
+    """
+    Aplica `processar(nome, arquivo)` a cada XML dos caminhos (inclusive
+    membros de pacotes) e devolve [(nome, resultado, metrica, erro)], com
+    metrica = (segundos, bytes, itens, xsd) e itens = contar_itens(resultado).
+    xsd é True/False conforme a validação com NFE_XSD, ou None sem ela.
+    Um pacote corrompido gera um erro com o nome do próprio pacote.
+    """
+    validado = True if XSD else None
+    resultados = []
+    for caminho in caminhos:
+        inicio = time.perf_counter()
+        try:
+            for nome, arquivo, tamanho in iterar_xmls(caminho):
+                try:
+                    resultado = processar(nome, arquivo)
+                    metrica = (time.perf_counter() - inicio, tamanho, contar_itens(resultado), validado)
+                    resultados.append((nome, resultado, metrica, None))
+                except Exception as e:
+                    xsd = False if isinstance(e, ErroValidacaoXSD) else None
+                    metrica = (time.perf_counter() - inicio, tamanho, 0, xsd)
+                    resultados.append((nome, None, metrica, f"{type(e).__name__}: {e}"))
+                inicio = time.perf_counter()
+        except Exception as e:
+            tamanho = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+            metrica = (time.perf_counter() - inicio, tamanho, 0, None)
+            resultados.append((caminho, None, metrica, f"{type(e).__name__}: {e}"))
+    return resultados
+
+
+def _extrair_lote(caminhos, modo, colunas=None):
+    """
+    Processa um lote de arquivos (em um worker ou no próprio processo).
+    Devolve, por arquivo, (caminho, colunas, linhas, metrica, erro) com as
+    linhas em tuplas: bem mais leve de serializar entre processos que
+    DataFrames.
+    """
+    extrair = EXTRATORES[modo]
+
+    def processar(nome, arquivo):
+        linhas = extrair(arquivo, colunas)
+        colunas_arquivo = tuple(linhas[0]) if linhas else ()
+        return colunas_arquivo, [tuple(linha.values()) for linha in linhas]
+
+    return [
+        (nome, *(resultado or ((), [])), metrica, erro)
+        for nome, resultado, metrica, erro in _processar_xmls(
+            caminhos, processar, lambda resultado: len(resultado[1])
+        )
     ]
 
-    dfs_pandas = []
-    total_arquivos = 0
 
-    for pasta in pastas:
-        arquivos_xml = glob.glob(os.path.join(pasta, "*.xml"))
-        total_arquivos += len(arquivos_xml)
+def _extrair_lote_normalizado(caminhos, modo, colunas=None):
+    """
+    Igual a _extrair_lote, mas devolve por arquivo
+    (caminho, (colunas, [linha_cabecalho]), (colunas, linhas_itens), metrica, erro),
+    com a chave de acesso como única coluna do cabeçalho nos itens.
+    """
+    extrair = EXTRATORES_NOTA[modo]
+
+    def processar(nome, arquivo):
+        cabecalho, itens = extrair(arquivo, colunas)
+        if cabecalho is None:
+            return ((), []), ((), [])
+
+        chave = cabecalho["chave_acesso"]
+        colunas_item = ("chave_acesso",) + (tuple(itens[0]) if itens else ())
+        return (
+            (tuple(cabecalho), [tuple(cabecalho.values())]),
+            (colunas_item, [(chave,) + tuple(item.values()) for item in itens]),
+        )
+
+    return [
+        (nome, *(resultado or (((), []), ((), []))), metrica, erro)
+        for nome, resultado, metrica, erro in _processar_xmls(
+            caminhos, processar, lambda resultado: len(resultado[1][1])
+        )
+    ]
 
-        for caminho_xml in arquivos_xml:
-            try:
-                df_xml = extrair_dados_xml_pandas(caminho_xml)
-                if not df_xml.empty:
-                    dfs_pandas.append(df_xml)
-            except Exception as e:
-                print(f"Erro no arquivo: {caminho_xml} -> {e}")
 
-    df_final_pandas = (
-        pd.concat(dfs_pandas, ignore_index=True)
-        if dfs_pandas else pd.DataFrame()
+def _dividir_em_lotes(caminhos, tamanho):
+    for inicio in range(0, len(caminhos), tamanho):
+        yield caminhos[inicio:inicio + tamanho]
+
+
+def _iterar_lotes(funcao, caminhos, workers, tamanho_lote, *args):
+    """
+    Executa `funcao(lote, *args)` sobre os lotes de arquivos e gera o
+    resultado de cada lote na ordem original. Com workers > 1 usa um
+    ProcessPoolExecutor mantendo no máximo 2 lotes por worker em voo, para
+    que um consumidor lento não acumule resultados em memória.
+    """
+    lotes = _dividir_em_lotes(list(caminhos), tamanho_lote)
+
+    if workers <= 1:
+        for lote in lotes:
+            yield funcao(lote, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pendentes = deque()
+        for lote in lotes:
+            pendentes.append(executor.submit(funcao, lote, *args))
+            if len(pendentes) >= workers * 2:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+
+def _executar_lotes(funcao, caminhos, workers, tamanho_lote, *args):
+    """
+    Igual a _iterar_lotes, mas devolve os resultados de todos os arquivos
+    numa única lista, na ordem original.
+    """
+    return [
+        r
+        for lote in _iterar_lotes(funcao, caminhos, workers, tamanho_lote, *args)
+        for r in lote
+    ]
+
+
+def _concatenar_blocos(partes):
+    """
+    Monta um DataFrame a partir de pares (colunas, linhas). Partes
+    consecutivas com as mesmas colunas viram um único bloco, evitando um
+    DataFrame por arquivo antes do concat.
+    """
+    blocos = []
+    colunas_bloco, linhas_bloco = None, []
+    for colunas, linhas in partes:
+        if not linhas:
+            continue
+        if colunas != colunas_bloco:
+            if linhas_bloco:
+                blocos.append(pd.DataFrame.from_records(linhas_bloco, columns=colunas_bloco))
+            colunas_bloco, linhas_bloco = colunas, []
+        linhas_bloco.extend(linhas)
+    if linhas_bloco:
+        blocos.append(pd.DataFrame.from_records(linhas_bloco, columns=colunas_bloco))
+
+    return pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame()
+
+
+def tipar_dataframe(df):
+    """
+    Converte as colunas de texto para os tipos de TIPOS_COLUNAS de forma
+    vetorizada (uma conversão por coluna, depois de juntar os lotes).
+    Valores vazios viram nulos; dhEmi é normalizado para UTC.
+    """
+    df = df.copy()
+    for coluna in df.columns:
+        tipo = TIPOS_COLUNAS.get(coluna)
+        if tipo is None:
+            continue
+        serie = df[coluna].mask(df[coluna] == '')
+        if tipo == "numero":
+            df[coluna] = pd.to_numeric(serie, errors="coerce").astype("float64")
+        elif tipo == "inteiro":
+            df[coluna] = pd.to_numeric(serie, errors="coerce").astype("Int64")
+        elif tipo == "data":
+            df[coluna] = pd.to_datetime(serie, errors="coerce", utc=True)
+        elif tipo == "categoria":
+            df[coluna] = serie.astype("category")
+    return df
+
+
+def _reportar_erros(resultados, metricas=None):
+    """
+    Imprime os erros do lote e, com um ColetorMetricas, registra a métrica
+    de cada arquivo. Os resultados trazem (nome, ..., metrica, erro).
+    """
+    for resultado in resultados:
+        caminho, metrica, erro = resultado[0], resultado[-2], resultado[-1]
+        if erro is not None:
+            print(f"Erro no arquivo: {caminho} -> {erro}")
+        if metricas is not None:
+            metricas.registrar(caminho, metrica, erro)
+
+
+def processar_arquivos(caminhos, modo=MODO_EXTRACAO, workers=1, tamanho_lote=64, colunas=None,
+                       tipado=False, metricas=None):
+    """
+    Extrai todos os arquivos e devolve um único DataFrame, opcionalmente
+    só com as colunas pedidas (ver COLUNAS_DISPONIVEIS) e com tipos
+    numéricos, data e categorias (tipado=True).
+    Com workers > 1 os lotes são distribuídos num ProcessPoolExecutor;
+    a ordem dos arquivos é preservada, então o resultado é idêntico ao
+    processamento serial. `metricas` (ColetorMetricas) recebe tempo,
+    bytes e itens de cada arquivo.
+    """
+    validar_modo(modo)
+    compilar_plano(colunas)  # valida a seleção antes de distribuir os lotes
+    resultados = _executar_lotes(
+        _extrair_lote, caminhos, workers, tamanho_lote, modo, colunas
+    )
+    _reportar_erros(resultados, metricas)
+
+    df = _concatenar_blocos(
+        (colunas_arquivo, linhas)
+        for _, colunas_arquivo, linhas, _, erro in resultados
+        if erro is None
+    )
+    return tipar_dataframe(df) if tipado else df
+
+
+def processar_arquivos_normalizado(caminhos, modo=MODO_EXTRACAO, workers=1, tamanho_lote=64,
+                                   colunas=None, tipado=False, metricas=None):
+    """
+    Extrai todos os arquivos em duas tabelas ligadas pela chave de acesso:
+    notas (um registro por NF-e, com os campos de cabeçalho) e itens (um
+    registro por det, só com a chave e os campos do item). Evita repetir
+    emitente, destinatário e dados da nota em cada linha de item.
+    """
+    validar_modo(modo)
+    if colunas is not None and "chave_acesso" not in colunas:
+        colunas = ["chave_acesso", *colunas]
+    compilar_plano(colunas)
+
+    resultados = _executar_lotes(
+        _extrair_lote_normalizado, caminhos, workers, tamanho_lote, modo, colunas
     )
+    _reportar_erros(resultados, metricas)
 
-    print("Processamento finalizado com sucesso.")
-    print(f"Total de arquivos XML encontrados: {total_arquivos}")
-    print(f"Total de linhas geradas (itens de NF-e): {len(df_final_pandas)}")
+    validos = [r for r in resultados if r[-1] is None]
+    df_notas = _concatenar_blocos(notas for _, notas, _, _, _ in validos)
+    df_itens = _concatenar_blocos(itens for _, _, itens, _, _ in validos)
+    if tipado:
+        return tipar_dataframe(df_notas), tipar_dataframe(df_itens)
+    return df_notas, df_itens
 
-    if not df_final_pandas.empty:
-        print("\nAmostra dos dados:")
-        print(df_final_pandas.head(5))
+
+def iterar_dataframes(caminhos, modo=MODO_EXTRACAO, workers=1, tamanho_lote=64, colunas=None,
+                      tipado=False, erros=None, metricas=None, concluidos=None):
+    """
+    Gera um DataFrame por lote de arquivos, à medida que os lotes ficam
+    prontos, sem juntar tudo em memória. Todos os DataFrames têm as mesmas
+    colunas (as do plano, na ordem da especificação), mesmo quando um lote
+    não tem emitente ou destinatário, para que possam ir direto a um destino
+    com esquema fixo.
+
+    Quando informada, a lista `erros` recebe (caminho, erro) de cada
+    arquivo (ou membro de pacote) que falhou; `metricas` recebe as
+    métricas por arquivo. A lista `concluidos` recebe os caminhos de cada
+    lote extraído antes de o DataFrame do lote ser entregue; lotes sem
+    linhas entram nela sem gerar DataFrame.
+    """
+    validar_modo(modo)
+    colunas_plano = compilar_plano(colunas)["colunas"]
+    caminhos = list(caminhos)
+    lotes = _dividir_em_lotes(caminhos, tamanho_lote)
+    for resultados in _iterar_lotes(_extrair_lote, caminhos, workers, tamanho_lote, modo, colunas):
+        _reportar_erros(resultados, metricas)
+        lote = next(lotes)
+        if concluidos is not None:
+            concluidos.extend(lote)
+        if erros is not None:
+            erros.extend((r[0], r[-1]) for r in resultados if r[-1] is not None)
+        df = _concatenar_blocos(
+            (colunas_arquivo, linhas)
+            for _, colunas_arquivo, linhas, _, erro in resultados
+            if erro is None
+        )
+        if df.empty:
+            continue
+        df = df.reindex(columns=colunas_plano)
+        yield tipar_dataframe(df) if tipado else df
+
+
+def iterar_blocos(caminhos, tamanho_bloco=TAMANHO_BLOCO, modo=MODO_EXTRACAO, workers=1,
+                  tamanho_lote=64, colunas=None, tipado=False, metricas=None):
+    """
+    Gera DataFrames de exatamente `tamanho_bloco` linhas (o último pode ser
+    menor), com as colunas do plano, para que a carga comece a gravar
+    enquanto a extração continua. Em memória fica só o bloco em montagem e
+    os lotes em voo (até 2 por worker), nunca o dataset inteiro. Uma nota
+    grande pode ser dividida entre dois blocos.
+
+        for df in iterar_blocos(arquivos_xml, 50_000, workers=4):
+            df.to_sql(tabela, engine, if_exists="append", index=False)
+    """
+    validar_modo(modo)
+    if tamanho_bloco < 1:
+        raise ValueError("tamanho_bloco deve ser maior que zero.")
+    colunas_plano = tuple(compilar_plano(colunas)["colunas"])
+
+    # Posição de cada coluna do plano nas linhas de cada leiaute de arquivo
+    posicoes = {}
+
+    def montar(linhas):
+        df = pd.DataFrame.from_records(linhas, columns=colunas_plano)
+        return tipar_dataframe(df) if tipado else df
+
+    pendentes = []
+    for resultados in _iterar_lotes(_extrair_lote, caminhos, workers, tamanho_lote, modo, colunas):
+        _reportar_erros(resultados, metricas)
+        for _, colunas_arquivo, linhas, _, erro in resultados:
+            if erro is not None or not linhas:
+                continue
+            if colunas_arquivo != colunas_plano:
+                if colunas_arquivo not in posicoes:
+                    indice = {c: i for i, c in enumerate(colunas_arquivo)}
+                    posicoes[colunas_arquivo] = [indice.get(c) for c in colunas_plano]
+                mapa = posicoes[colunas_arquivo]
+                linhas = [
+                    tuple(None if i is None else linha[i] for i in mapa)
+                    for linha in linhas
+                ]
+            pendentes.extend(linhas)
+
+            if len(pendentes) >= tamanho_bloco:
+                inicio = 0
+                while len(pendentes) - inicio >= tamanho_bloco:
+                    yield montar(pendentes[inicio:inicio + tamanho_bloco])
+                    inicio += tamanho_bloco
+                del pendentes[:inicio]
+
+    if pendentes:
+        yield montar(pendentes)
+
+
+def processar_incremental(caminhos, caminho_manifesto, ao_carregar, modo=MODO_EXTRACAO,
+                          workers=1, tamanho_lote=64, colunas=None, tipado=False,
+                          metricas=None):
+    """
+    Igual a processar_arquivos, mas só extrai arquivos novos ou alterados
+    desde a última execução, segundo o manifesto SQLite em
+    `caminho_manifesto` (caminho, tamanho, mtime e hash de cada arquivo).
+
+    `ao_carregar(df)` recebe o DataFrame e deve gravá-lo no destino. O
+    manifesto só é atualizado depois que ele retorna: se a carga levantar
+    uma exceção, nada é registrado e os arquivos voltam na próxima execução.
+
+    Notas cuja chave de acesso já foi carregada a partir de outro arquivo
+    são descartadas, assim como chaves repetidas dentro da mesma execução.
+    Um arquivo alterado volta com todas as linhas da nota, então a carga
+    de destino deve fazer upsert por chave_acesso. Arquivos com erro (ou
+    pacotes com algum membro com erro) não entram no manifesto e são
+    tentados de novo na próxima execução.
+    """
+    validar_modo(modo)
+    if colunas is not None and "chave_acesso" not in colunas:
+        colunas = ["chave_acesso", *colunas]
+    compilar_plano(colunas)
+
+    conexao = abrir_manifesto(caminho_manifesto)
+    try:
+        pendentes = {p["caminho"]: p for p in filtrar_pendentes(conexao, caminhos)}
+        resultados = _executar_lotes(
+            _extrair_lote, list(pendentes), workers, tamanho_lote, modo, colunas
+        )
+        _reportar_erros(resultados, metricas)
+
+        # Membros de pacote respondem pelo pacote ("pacote.zip::nota.xml")
+        def unidade(nome):
+            return nome.split(SEPARADOR_PACOTE, 1)[0]
+
+        com_erro = {unidade(r[0]) for r in resultados if r[-1] is not None}
+
+        validos = []
+        for caminho, colunas_arquivo, linhas, _, erro in resultados:
+            if erro is not None:
+                continue
+            chave = linhas[0][colunas_arquivo.index("chave_acesso")] if linhas else None
+            validos.append((caminho, colunas_arquivo, linhas, chave))
+
+        ja_processadas = chaves_processadas(conexao, {v[3] for v in validos if v[3]})
+        partes, notas, vistas = [], [], set()
+        chave_arquivo = {}
+        for caminho, colunas_arquivo, linhas, chave in validos:
+            chave_arquivo[caminho] = chave
+            if chave:
+                if chave in vistas or ja_processadas.get(chave, caminho) != caminho:
+                    continue
+                vistas.add(chave)
+                notas.append((chave, caminho))
+            partes.append((colunas_arquivo, linhas))
+
+        df = _concatenar_blocos(partes)
+        if tipado:
+            df = tipar_dataframe(df)
+        ao_carregar(df)
+        registrar_processados(
+            conexao,
+            [
+                {**pendente, "chave_acesso": chave_arquivo.get(caminho)}
+                for caminho, pendente in pendentes.items()
+                if caminho not in com_erro
+            ],
+            notas,
+        )
+    finally:
+        conexao.close()
+
+    print(f"Arquivos novos ou alterados: {len(pendentes)} | Notas novas ou alteradas: {len(partes)}")
+    return df
+
+
+def _validar_agregacao(dimensoes, valores):
+    """
+    Valida dimensões e valores da agregação e devolve as colunas que
+    precisam ser extraídas. Valores têm de ser colunas numéricas do item;
+    dimensões do grupo total (vNF) não são aceitas, pois no streaming só
+    chegam depois dos itens.
+    """
+    colunas_item = {c for c, _, _ in CAMPOS_ITEM + CAMPOS_ITEM_ADICIONAIS}
+    invalidos = [
+        v for v in valores if v not in colunas_item or TIPOS_COLUNAS.get(v) != "numero"
+    ]
+    if invalidos:
+        raise ValueError(f"Valores agregáveis são colunas numéricas do item: {invalidos}")
+
+    grupo_total = {c for c, grupo, _ in CAMPOS_CABECALHO if grupo == "total"}
+    if grupo_total & set(dimensoes):
+        raise ValueError(f"Dimensões do grupo total não são aceitas: {sorted(grupo_total)}")
+
+    colunas = ["dhEmi" if d == "ano_mes" else d for d in dimensoes] + list(valores)
+    colunas = list(dict.fromkeys(colunas))
+    compilar_plano(colunas)
+    return colunas
+
+
+def _iterar_itens_nota(arquivo, modo, colunas):
+    """
+    Gera (cabecalho, item) para cada item da nota, sem montar a lista de
+    linhas. No streaming o cabeçalho é o dict preenchido durante a leitura
+    (ide, emit e dest vêm antes dos itens no leiaute da NF-e).
+    """
+    if modo == "streaming":
+        cabecalho = {}
+        for item in iterar_itens_xml(arquivo, cabecalho, colunas):
+            yield cabecalho, item
+        return
+
+    cabecalho, itens = extrair_nota_xml(arquivo, colunas)
+    for item in itens:
+        yield cabecalho, item
+
+
+def _somar_acumuladores(destino, origem):
+    """
+    Soma os acumuladores de `origem` em `destino` ({grupo: [qtd, somas...]}).
+    """
+    for grupo, acumulador in origem.items():
+        atual = destino.get(grupo)
+        if atual is None:
+            destino[grupo] = acumulador
+        else:
+            for i, valor in enumerate(acumulador):
+                atual[i] += valor
+
+
+def _agregar_lote(caminhos, modo, dimensoes, valores):
+    """
+    Agrega um lote de arquivos (em um worker ou no próprio processo).
+    Cada item é somado ao acumulador do seu grupo assim que é lido, então
+    só os totais por grupo ficam em memória. Devolve (acumuladores,
+    [(caminho, metrica, erro)]); um arquivo com erro não entra nos totais.
+    """
+    colunas = _validar_agregacao(dimensoes, valores)
+    colunas_item = set(compilar_plano(colunas)["item"][0])
+    leitores = [
+        (d, "ano_mes" if d == "ano_mes" else ("item" if d in colunas_item else "cabecalho"))
+        for d in dimensoes
+    ]
+
+    acumuladores = {}
+
+    def processar(nome, arquivo):
+        # Acumula por arquivo e só junta no fim, para não somar notas pela metade
+        parcial = {}
+        for cabecalho, item in _iterar_itens_nota(arquivo, modo, colunas):
+            grupo = tuple(
+                cabecalho.get("dhEmi", "")[:7] if origem == "ano_mes"
+                else item[d] if origem == "item"
+                else cabecalho.get(d, "")
+                for d, origem in leitores
+            )
+            acumulador = parcial.get(grupo)
+            if acumulador is None:
+                acumulador = parcial[grupo] = [0] + [0.0] * len(valores)
+            acumulador[0] += 1
+            for i, coluna in enumerate(valores, 1):
+                valor = item[coluna]
+                if valor:
+                    acumulador[i] += float(valor)
+        _somar_acumuladores(acumuladores, parcial)
+        return sum(acumulador[0] for acumulador in parcial.values())
+
+    arquivos = [
+        (nome, metrica, erro)
+        for nome, _, metrica, erro in _processar_xmls(caminhos, processar, lambda itens: itens)
+    ]
+    return acumuladores, arquivos
+
+
+def agregar_impostos(caminhos, dimensoes=None, valores=None, modo=MODO_EXTRACAO, workers=1,
+                     tamanho_lote=64, metricas=None):
+    """
+    Soma os valores dos itens (impostos, por padrão) agrupados pelas
+    dimensões, sem criar uma linha por item: cada item é acumulado no seu
+    grupo à medida que é lido e os workers devolvem só os totais parciais.
+    Devolve um DataFrame com as dimensões, qtd_itens e a soma de cada valor
+    (arredondada em 2 casas), ordenado pelas dimensões.
+    """
+    validar_modo(modo)
+    dimensoes = list(dimensoes or AGREGAR_POR)
+    valores = list(valores or VALORES_AGREGADOS)
+    _validar_agregacao(dimensoes, valores)
+
+    acumuladores = {}
+    for parcial, arquivos in _iterar_lotes(
+        _agregar_lote, caminhos, workers, tamanho_lote, modo, dimensoes, valores
+    ):
+        _reportar_erros(arquivos, metricas)
+        _somar_acumuladores(acumuladores, parcial)
+
+    df = pd.DataFrame.from_records(
+        [grupo + tuple(acumulador) for grupo, acumulador in acumuladores.items()],
+        columns=[*dimensoes, "qtd_itens", *valores],
+    )
+    df[valores] = df[valores].round(2)
+    return df.sort_values(dimensoes, ignore_index=True)
+
+
+def _executar_saida(arquivos_xml, metricas):
+    """
+    Processa os arquivos no formato de SAIDA e imprime o resultado.
+    """
+    total_arquivos = len(arquivos_xml)
+
+    if SAIDA == "agregada":
+        df_totais = agregar_impostos(
+            arquivos_xml,
+            modo=MODO_EXTRACAO,
+            workers=WORKERS,
+            tamanho_lote=TAMANHO_LOTE,
+            metricas=metricas,
+        )
+        print("Processamento finalizado com sucesso.")
+        print(f"Total de arquivos XML/pacotes encontrados: {total_arquivos}")
+        print(f"Grupos: {len(df_totais)} | Itens agregados: {df_totais['qtd_itens'].sum()}")
+        if not df_totais.empty:
+            print("\nTotais por grupo:")
+            print(df_totais.head(20))
+        else:
+            print("Nenhum dado válido foi extraído.")
+        return
+
+    if SAIDA == "normalizada":
+        df_notas, df_itens = processar_arquivos_normalizado(
+            arquivos_xml,
+            modo=MODO_EXTRACAO,
+            workers=WORKERS,
+            tamanho_lote=TAMANHO_LOTE,
+            colunas=COLUNAS,
+            tipado=TIPADO,
+            metricas=metricas,
+        )
+        print("Processamento finalizado com sucesso.")
+        print(f"Total de arquivos XML/pacotes encontrados: {total_arquivos}")
+        print(f"Total de notas: {len(df_notas)} | Total de itens: {len(df_itens)}")
+        if not df_itens.empty:
+            print("\nAmostra das notas:")
+            print(df_notas.head(5))
+            print("\nAmostra dos itens:")
+            print(df_itens.head(5))
+        else:
+            print("Nenhum dado válido foi extraído.")
+        return
+
+    def exibir_itens(df_final_pandas):
+        print("Processamento finalizado com sucesso.")
+        print(f"Total de arquivos XML/pacotes encontrados: {total_arquivos}")
+        print(f"Total de linhas geradas (itens de NF-e): {len(df_final_pandas)}")
+
+        if not df_final_pandas.empty:
+            print("\nAmostra dos dados:")
+            print(df_final_pandas.head(5))
+        else:
+            print("Nenhum dado válido foi extraído.")
+
+    if MANIFESTO:
+        # A exibição faz as vezes da carga: o manifesto só é gravado depois dela
+        processar_incremental(
+            arquivos_xml,
+            MANIFESTO,
+            exibir_itens,
+            modo=MODO_EXTRACAO,
+            workers=WORKERS,
+            tamanho_lote=TAMANHO_LOTE,
+            colunas=COLUNAS,
+            tipado=TIPADO,
+            metricas=metricas,
+        )
     else:
-        print("Nenhum dado válido foi extraído.")
+        exibir_itens(processar_arquivos(
+            arquivos_xml,
+            modo=MODO_EXTRACAO,
+            workers=WORKERS,
+            tamanho_lote=TAMANHO_LOTE,
+            colunas=COLUNAS,
+            tipado=TIPADO,
+            metricas=metricas,
+        ))
+
+
+def main():
+    arquivos_xml = []
+    for pasta in PASTAS_XML:
+        arquivos_xml.extend(listar_arquivos_nfe(pasta))
+
+    with ColetorMetricas(METRICAS, QUARENTENA, SEPARADOR_PACOTE) as metricas:
+        _executar_saida(arquivos_xml, metricas)
+        metricas.imprimir_resumo()
 
 
 if __name__ == "__main__":
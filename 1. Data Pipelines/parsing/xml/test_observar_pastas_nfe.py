@@ -0,0 +1,84 @@
+"""
+Testes do microlote de observar_pastas_nfe.py: uma falha de gravação no
+meio do microlote não pode duplicar linhas no dataset Parquet quando o
+observador tenta de novo.
+
+Author: Gustavo F. Lima
+License: MIT
+Created: 2025
+"""
+
+# pip install pytest pandas pyarrow
+
+import pyarrow.parquet as pq
+import pytest
+
+import gravar_parquet_nfe
+from gerar_nfe_sintetica import gerar_pasta
+from manifesto_nfe import abrir_manifesto
+from observar_pastas_nfe import processar_microlote
+from processar_xml_nfe import listar_arquivos_nfe
+
+TOTAL_NOTAS = 12
+ITENS_POR_NOTA = 3
+TAMANHO_LOTE = 4
+
+
+def _falhar_no_lote(monkeypatch, numero_lote):
+    """
+    Faz a gravação do lote indicado (1 = primeiro) falhar uma vez, depois
+    de já ter escrito metade das linhas, como um disco que enche no meio.
+    """
+    gravar = pq.write_to_dataset
+    chamadas = []
+
+    def gravar_com_falha(tabela, *args, **kwargs):
+        chamadas.append(1)
+        if len(chamadas) == numero_lote:
+            gravar(tabela.slice(0, tabela.num_rows // 2), *args, **kwargs)
+            raise OSError("disco cheio")
+        return gravar(tabela, *args, **kwargs)
+
+    monkeypatch.setattr(gravar_parquet_nfe.pq, "write_to_dataset", gravar_com_falha)
+
+
+@pytest.fixture
+def pastas(tmp_path):
+    gerar_pasta(str(tmp_path / "xml"), TOTAL_NOTAS, ITENS_POR_NOTA)
+    arquivos = listar_arquivos_nfe(str(tmp_path / "xml"))
+    conexao = abrir_manifesto(str(tmp_path / "manifesto.db"))
+    yield arquivos, str(tmp_path / "parquet"), conexao
+    conexao.close()
+
+
+@pytest.mark.parametrize("lote_com_falha", [1, 2, 3])
+def test_falha_no_meio_do_microlote_nao_duplica_linhas(monkeypatch, pastas, lote_com_falha):
+    arquivos, destino, conexao = pastas
+    _falhar_no_lote(monkeypatch, lote_com_falha)
+
+    with pytest.raises(OSError):
+        processar_microlote(conexao, arquivos, destino, tamanho_lote=TAMANHO_LOTE)
+
+    # Os lotes anteriores à falha já estão no manifesto e não voltam
+    registrados = conexao.execute("SELECT COUNT(*) FROM arquivos").fetchone()[0]
+    assert registrados == (lote_com_falha - 1) * TAMANHO_LOTE
+
+    arquivos_gravados, linhas = processar_microlote(
+        conexao, arquivos, destino, tamanho_lote=TAMANHO_LOTE
+    )
+    assert arquivos_gravados == TOTAL_NOTAS - registrados
+
+    df = pq.read_table(destino).to_pandas()
+    assert len(df) == TOTAL_NOTAS * ITENS_POR_NOTA
+    assert not df.duplicated(["chave_acesso", "nItem"]).any()
+    assert df["chave_acesso"].nunique() == TOTAL_NOTAS
+
+
+def test_microlote_ja_registrado_nao_e_regravado(pastas):
+    arquivos, destino, conexao = pastas
+
+    assert processar_microlote(conexao, arquivos, destino, tamanho_lote=TAMANHO_LOTE) == (
+        TOTAL_NOTAS, TOTAL_NOTAS * ITENS_POR_NOTA
+    )
+    assert processar_microlote(conexao, arquivos, destino, tamanho_lote=TAMANHO_LOTE) == (0, 0)
+    assert pq.read_table(destino).num_rows == TOTAL_NOTAS * ITENS_POR_NOTA